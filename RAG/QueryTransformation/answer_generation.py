@@ -0,0 +1,30 @@
+ANSWER_PROMPT = """
+You are an AI assistant that answers questions about a set of PDF documents.
+Answer the user query using only the context below. Cite the context blocks
+you used as [1], [2], ... If the context does not contain the answer, say so.
+
+Context:
+{context}
+
+User query: {query}
+"""
+
+
+def format_context(documents):
+    """
+    Number the retrieved chunks and label them with their source and page.
+    """
+    blocks = []
+    for i, doc in enumerate(documents, 1):
+        source = doc.metadata.get("source", "Unknown")
+        page = doc.metadata.get("page", 0) + 1
+        blocks.append(f"[{i}] ({source}, page {page})\n{doc.page_content}")
+    return "\n\n".join(blocks)
+
+
+def generate_answer(llm, query, documents):
+    """
+    Answer `query` from the (compressed) retrieved documents.
+    """
+    response = llm.invoke(ANSWER_PROMPT.format(context=format_context(documents), query=query))
+    return response.content
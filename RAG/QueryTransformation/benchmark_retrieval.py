@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+import numpy as np
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from bm25_index import BM25Index
+from embedding_pipeline import EmbeddingCache, FakeEmbedder
+from ingestion import sync_documents
+from mmr import mmr_rerank
+from numpy_store import NumpyVectorStore
+from query_fanout import reciprocal_rank_fusion
+
+DEFAULT_PDF = Path(__file__).parent.parent / "DataSource" / "Embeddings & vector stores.pdf"
+DEFAULT_QUERIES = Path(__file__).parent / "benchmark_queries.json"
+
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", text).lower()
+
+
+def is_relevant(doc, phrases):
+    """
+    A chunk is relevant to a labelled query if it contains one of its phrases.
+    """
+    content = normalize_text(doc.page_content)
+    return any(normalize_text(phrase) in content for phrase in phrases)
+
+
+def directory_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def resident_bytes(store):
+    """
+    Bytes the store scans per query: the codes when quantized, else the float32 matrix.
+    """
+    return store.codes.nbytes if store.quantization else store.vectors.nbytes
+
+
+def build_store(pages, embedding, chunk_size, chunk_overlap, path, nlist, quantization=None, oversampling=4.0,
+                hybrid=False):
+    """
+    Split `pages` and index them into a fresh NumpyVectorStore (and a BM25Index when `hybrid`).
+
+    Returns (store, lexical index or None, embedding cache, number of chunks, ingestion seconds).
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    store = NumpyVectorStore(
+        path=Path(path) / "vectors", embedding=embedding, nlist=nlist, quantization=quantization, oversampling=oversampling
+    )
+    lexical_index = BM25Index(Path(path) / "bm25") if hybrid else None
+    cache = EmbeddingCache(Path(path) / "embeddings.sqlite3")
+
+    start = time.perf_counter()
+    added, _, kept = sync_documents(
+        store, embedding, splitter.split_documents(pages), source="benchmark", cache=cache, lexical_index=lexical_index
+    )
+    return store, lexical_index, cache, added + kept, time.perf_counter() - start
+
+
+def evaluate(store, labelled_queries, query_vectors, k, repeat, lexical_index=None, fetch_k=None, rerank=None):
+    """
+    Return recall@k, MRR@k and per-search latencies (ms) for one store and k.
+
+    With a BM25Index the dense and lexical results are fused with RRF, and
+    the latency covers both searches. With `rerank`, `fetch_k` candidates
+    are fetched and re-ranked down to `k`, inside the timed section.
+    """
+    fetch_k = max(fetch_k or k, k)
+    hits = 0
+    reciprocal_ranks = []
+    latencies = []
+
+    for item, vector in zip(labelled_queries, query_vectors):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = store.similarity_search_with_score_by_vector(vector, k=fetch_k)
+            if lexical_index is not None:
+                results = reciprocal_rank_fusion([results, lexical_index.search(item["query"], k=fetch_k)])[:fetch_k]
+            results = rerank(item["query"], results, k) if rerank else results[:k]
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        rank = next((i for i, (doc, _) in enumerate(results, 1) if is_relevant(doc, item["relevant"])), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    return hits / len(labelled_queries), float(np.mean(reciprocal_ranks)), latencies
+
+
+def run_benchmark(pdf_path, queries_path, chunk_sizes, chunk_overlaps, ks, embedding, nlist=0, repeat=5,
+                  quantizations=(None,), oversampling=4.0, hybrid=False, mmr_lambda=None, fetch_k_factor=4):
+    pages = PyPDFLoader(pdf_path).load()
+    with open(queries_path, "r") as f:
+        labelled_queries = json.load(f)
+    query_vectors = [embedding.embed_query(item["query"]) for item in labelled_queries]
+
+    rows = []
+    for chunk_size in chunk_sizes:
+        for chunk_overlap in chunk_overlaps:
+            if chunk_overlap >= chunk_size:
+                continue
+
+            for quantization in quantizations:
+                with tempfile.TemporaryDirectory() as tmp:
+                    store, lexical_index, cache, chunks, ingest_seconds = build_store(
+                        pages, embedding, chunk_size, chunk_overlap, tmp, nlist, quantization, oversampling, hybrid
+                    )
+                    # The embedding cache is not part of the index
+                    index_bytes = directory_size(Path(tmp) / "vectors") + directory_size(Path(tmp) / "bm25")
+                    rerank = None
+                    if mmr_lambda is not None:
+                        rerank = partial(mmr_rerank, embedding, lambda_mult=mmr_lambda, cache=cache)
+
+                    for k in ks:
+                        recall, mrr, latencies = evaluate(
+                            store, labelled_queries, query_vectors, k, repeat, lexical_index,
+                            # Over-fetch only for MMR, so plain rows match the production path (fetch_k = k)
+                            k * fetch_k_factor if rerank else None, rerank,
+                        )
+                        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                        rows.append({
+                            "chunk_size": chunk_size,
+                            "chunk_overlap": chunk_overlap,
+                            "quantization": quantization or "none",
+                            "mode": ("hybrid" if hybrid else "dense") + ("+mmr" if rerank else ""),
+                            "k": k,
+                            "chunks": chunks,
+                            "recall": recall,
+                            "mrr": mrr,
+                            "p50_ms": float(p50),
+                            "p95_ms": float(p95),
+                            "p99_ms": float(p99),
+                            "index_kb": index_bytes / 1024,
+                            "scan_kb": resident_bytes(store) / 1024,
+                            "ingest_s": ingest_seconds,
+                        })
+
+                    # Release the memory map and the SQLite file before the directory is removed
+                    cache.close()
+                    del store, lexical_index
+    return rows
+
+
+def print_rows(rows):
+    header = f"{'chunk':>6} {'overlap':>7} {'quant':>6} {'mode':>10} {'k':>3} {'chunks':>6} {'recall':>7} {'mrr':>6} {'p50ms':>7} {'p95ms':>7} {'p99ms':>7} {'indexKB':>8} {'scanKB':>8} {'ingest_s':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['chunk_size']:>6} {r['chunk_overlap']:>7} {r['quantization']:>6} {r['mode']:>10} {r['k']:>3} {r['chunks']:>6} {r['recall']:>7.3f} {r['mrr']:>6.3f} "
+            f"{r['p50_ms']:>7.3f} {r['p95_ms']:>7.3f} {r['p99_ms']:>7.3f} {r['index_kb']:>8.1f} {r['scan_kb']:>8.1f} {r['ingest_s']:>8.3f}"
+        )
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def quantization_list(value):
+    return [None if v == "none" else v for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunking and k settings for PDF retrieval")
+    parser.add_argument("--pdf", type=Path, default=DEFAULT_PDF, help="PDF to index")
+    parser.add_argument("--queries", type=Path, default=DEFAULT_QUERIES, help="Labelled query set (JSON)")
+    parser.add_argument("--chunk-sizes", type=int_list, default=[500, 1000, 1500])
+    parser.add_argument("--chunk-overlaps", type=int_list, default=[0, 200])
+    parser.add_argument("--k", type=int_list, default=[1, 2, 4, 8])
+    parser.add_argument("--nlist", type=int, default=0, help="IVF partitions for the NumPy store (0 = brute force)")
+    parser.add_argument("--quantization", type=quantization_list, default=[None],
+                        help="Comma-separated list of none, scalar, binary")
+    parser.add_argument("--oversampling", type=float, default=4.0, help="Rescoring candidates per result when quantized")
+    parser.add_argument("--hybrid", action="store_true", help="Fuse BM25 lexical results with the dense ones")
+    parser.add_argument("--mmr", type=float, metavar="LAMBDA",
+                        help="Re-rank with maximal marginal relevance (1.0 = relevance only, 0.0 = diversity only)")
+    parser.add_argument("--fetch-k-factor", type=int, default=4, help="Candidates fetched per result for --mmr")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed searches per query")
+    parser.add_argument("--embedder", choices=["fake", "gemini"], default="fake",
+                        help="'fake' runs fully offline, 'gemini' uses GoogleGenerativeAIEmbeddings")
+    parser.add_argument("--json", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.embedder == "gemini":
+        from dotenv import load_dotenv
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        load_dotenv()
+        os.environ.setdefault("GOOGLE_API_KEY", os.getenv("GEMINI_API_KEY", ""))
+        embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+    else:
+        embedding = FakeEmbedder()
+
+    rows = run_benchmark(
+        args.pdf, args.queries, args.chunk_sizes, args.chunk_overlaps, args.k, embedding,
+        nlist=args.nlist, repeat=args.repeat, quantizations=args.quantization, oversampling=args.oversampling,
+        hybrid=args.hybrid, mmr_lambda=args.mmr, fetch_k_factor=args.fetch_k_factor,
+    )
+    print_rows(rows)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
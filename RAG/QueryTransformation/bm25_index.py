@@ -0,0 +1,214 @@
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from langchain_core.documents import Document
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._\-/:][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """
+    Lower-case word tokens. Compound identifiers such as `faiss.IndexHNSWFlat`
+    or `ERR_CONNECTION-404` are kept whole and also split into their parts, so
+    both exact API names and their pieces match.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[._\-/:]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over the same chunks as the vector store.
+
+    Postings are kept in CSR form: `offsets[t]:offsets[t + 1]` slices the
+    `posting_docs` / `posting_tfs` arrays for term id `t`, so scoring a query
+    term is one vectorised update over its posting list. The arrays are
+    stored in bm25.npz; the vocabulary, ids and chunk payloads in bm25.json.
+
+    Offers stored_hashes/add/delete/flush like the ingestion targets, minus
+    the vectors, so sync_documents can keep it in step with the vector store.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.vocabulary = {}
+        self.ids = []
+        self.payloads = []
+        self._forward = []
+        self._dirty = False
+        self._stale = False
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.posting_docs = np.zeros(0, dtype=np.int32)
+        self.posting_tfs = np.zeros(0, dtype=np.uint16)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self._load()
+
+    def _load(self):
+        meta_file = self.path / "bm25.json"
+        if not meta_file.exists():
+            return
+
+        with open(meta_file, "r") as f:
+            data = json.load(f)
+        self.vocabulary = {term: i for i, term in enumerate(data["terms"])}
+        self.ids = data["ids"]
+        self.payloads = data["payloads"]
+
+        arrays = np.load(self.path / "bm25.npz")
+        self.offsets = arrays["offsets"]
+        self.posting_docs = arrays["posting_docs"]
+        self.posting_tfs = arrays["posting_tfs"]
+        self.doc_len = arrays["doc_len"]
+        self._compute_idf()
+        self._forward = None
+
+    def _compute_idf(self):
+        df = np.diff(self.offsets).astype(np.float32)
+        n = len(self.ids)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def _forward_lists(self):
+        """
+        Per-chunk (term ids, term frequencies), rebuilt from the postings after a load.
+        """
+        if self._forward is None and not self.ids:
+            self._forward = []
+        if self._forward is None:
+            terms = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets))
+            order = np.argsort(self.posting_docs, kind="stable")
+            splits = np.cumsum(np.bincount(self.posting_docs, minlength=len(self.ids)))[:-1]
+            self._forward = list(zip(np.split(terms[order], splits), np.split(self.posting_tfs[order], splits)))
+        return self._forward
+
+    def _build(self):
+        """
+        Rebuild the CSR postings from the per-chunk term lists.
+        """
+        forward = self._forward_lists()
+        lengths = [len(term_ids) for term_ids, _ in forward]
+        all_terms = np.concatenate([t for t, _ in forward]) if forward else np.zeros(0, dtype=np.int32)
+        all_tfs = np.concatenate([tf for _, tf in forward]) if forward else np.zeros(0, dtype=np.uint16)
+        all_docs = np.repeat(np.arange(len(forward), dtype=np.int32), lengths)
+
+        order = np.argsort(all_terms, kind="stable")
+        counts = np.bincount(all_terms, minlength=len(self.vocabulary))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.posting_docs = all_docs[order]
+        self.posting_tfs = all_tfs[order]
+        self.doc_len = np.array([tf.sum() for _, tf in forward], dtype=np.float32)
+        self._compute_idf()
+        self._stale = False
+
+    def stored_hashes(self, source):
+        return {
+            payload["metadata"]["content_hash"]: doc_id
+            for doc_id, payload in zip(self.ids, self.payloads)
+            if payload["metadata"].get("source") == source and payload["metadata"].get("content_hash")
+        }
+
+    def stored_sources(self):
+        return {payload["metadata"].get("source") for payload in self.payloads} - {None}
+
+    def add(self, ids, documents):
+        """
+        Index chunks under the given ids. Call flush() to persist.
+        """
+        existing = set(self.ids)
+        self.delete([i for i in ids if i in existing])
+
+        forward = self._forward_lists()
+        for doc_id, doc in zip(ids, documents):
+            counts = Counter(tokenize(doc.page_content))
+            term_ids = np.array([self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts], dtype=np.int32)
+            tfs = np.minimum(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)), 65535).astype(np.uint16)
+            forward.append((term_ids, tfs))
+            self.ids.append(doc_id)
+            self.payloads.append({"page_content": doc.page_content, "metadata": doc.metadata})
+        self._dirty = self._stale = True
+
+    def delete(self, ids):
+        drop = set(ids)
+        if not drop:
+            return
+        forward = self._forward_lists()
+        keep = [row for row, doc_id in enumerate(self.ids) if doc_id not in drop]
+        self._forward = [forward[row] for row in keep]
+        self.ids = [self.ids[row] for row in keep]
+        self.payloads = [self.payloads[row] for row in keep]
+        self._dirty = self._stale = True
+
+    def flush(self):
+        """
+        Rebuild the postings and write the index to disk.
+        """
+        if not self._dirty:
+            return
+        if self._stale:
+            self._build()
+
+        np.savez(
+            self.path / "bm25.tmp.npz",
+            offsets=self.offsets,
+            posting_docs=self.posting_docs,
+            posting_tfs=self.posting_tfs,
+            doc_len=self.doc_len,
+        )
+        os.replace(self.path / "bm25.tmp.npz", self.path / "bm25.npz")
+
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(self.path / "bm25.json.tmp", "w") as f:
+            json.dump({"terms": terms, "ids": self.ids, "payloads": self.payloads}, f)
+        os.replace(self.path / "bm25.json.tmp", self.path / "bm25.json")
+        self._dirty = False
+
+    def search(self, query, k=4, sources=None):
+        """
+        Return the `k` best (Document, bm25 score) pairs for `query`,
+        optionally limited to chunks of `sources`.
+        """
+        if self._stale:
+            self._build()
+        if not self.ids:
+            return []
+
+        avg_len = float(self.doc_len.mean()) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / avg_len)
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None or term_id >= len(self.idf):
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.posting_docs[start:end]
+            tfs = self.posting_tfs[start:end].astype(np.float32)
+            # Each chunk appears once per posting list, so fancy-index += is safe
+            scores[docs] += self.idf[term_id] * tfs * (self.k1 + 1) / (tfs + norm[docs])
+
+        if sources is not None:
+            sources = set(sources)
+            scores[[row for row, p in enumerate(self.payloads) if p["metadata"].get("source") not in sources]] = 0
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(page_content=self.payloads[row]["page_content"], metadata=self.payloads[row]["metadata"]), float(scores[row]))
+            for row in top
+        ]
@@ -0,0 +1,53 @@
+import re
+import numpy as np
+from langchain_core.documents import Document
+from embedding_pipeline import content_hash, embed_chunks
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+
+
+def split_sentences(text):
+    """
+    Split chunk text into sentences, joining the hard line breaks of PDF text.
+    """
+    text = re.sub(r"\s+", " ", text).strip()
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence]
+
+
+def compress_documents(embedding, query, results, threshold=0.8, cache=None):
+    """
+    Keep only the sentences of each retrieved chunk that are relevant to `query`.
+
+    Sentences of all chunks are embedded in one batched call and scored with
+    a single matrix-vector product. Pass a bounded `cache` such as
+    MemoryEmbeddingCache; the ingestion EmbeddingCache would grow with every
+    query and mix sentence vectors into the chunk vectors. A
+    sentence is kept when its similarity reaches `threshold` times the best
+    sentence score; every chunk keeps at least its best sentence. Sentence
+    order is preserved. Returns (Document, score) pairs like the input.
+    """
+    chunk_sentences = [split_sentences(doc.page_content) for doc, _ in results]
+    sentences = [sentence for chunk in chunk_sentences for sentence in chunk]
+    if not sentences:
+        return results
+
+    vectors = np.asarray(
+        embed_chunks(embedding, sentences, [content_hash(s) for s in sentences], cache=cache), dtype=np.float32
+    )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+    query_vector = np.asarray(embedding.embed_query(query), dtype=np.float32)
+    scores = vectors @ (query_vector / max(np.linalg.norm(query_vector), 1e-12))
+    cutoff = threshold * scores.max()
+
+    compressed = []
+    start = 0
+    for (doc, score), chunk in zip(results, chunk_sentences):
+        chunk_scores = scores[start:start + len(chunk)]
+        start += len(chunk)
+        if not chunk:
+            continue
+        keep = chunk_scores >= cutoff
+        keep[np.argmax(chunk_scores)] = True
+        text = " ".join(sentence for sentence, kept in zip(chunk, keep) if kept)
+        compressed.append((Document(page_content=text, metadata=doc.metadata), score))
+    return compressed
@@ -0,0 +1,461 @@
+import os
+import queue
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+from pathlib import Path
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+from embedding_pipeline import content_hash, embed_chunks
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    IsEmptyCondition,
+    MatchAny,
+    MatchValue,
+    OptimizersConfigDiff,
+    PayloadField,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+
+# Payload layout used by langchain_qdrant.QdrantVectorStore
+CONTENT_KEY = "page_content"
+METADATA_KEY = "metadata"
+
+# Payload fields backed by Qdrant payload indexes, for fast per-document filters
+PAYLOAD_INDEXES = {
+    f"{METADATA_KEY}.source": PayloadSchemaType.KEYWORD,
+    f"{METADATA_KEY}.page": PayloadSchemaType.INTEGER,
+}
+
+
+def quantization_config(kind):
+    """
+    Qdrant quantization config for "scalar" (int8) or "binary", kept in RAM.
+    """
+    if kind == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if kind == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    raise ValueError(f"Unknown quantization '{kind}', expected 'scalar' or 'binary'")
+
+
+def quantized_search_params(oversampling=4.0):
+    """
+    Search the quantized vectors first, then rescore the top candidates with the originals.
+    """
+    return SearchParams(quantization=QuantizationSearchParams(rescore=True, oversampling=oversampling))
+
+
+def source_filter(sources):
+    """
+    Qdrant filter restricting a search to chunks of the given source documents.
+    """
+    return Filter(must=[FieldCondition(key=f"{METADATA_KEY}.source", match=MatchAny(any=list(sources)))])
+
+
+def point_id(source, chunk_hash):
+    """
+    Deterministic point id for a chunk of a given source document.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}#{chunk_hash}"))
+
+
+class QdrantCollection:
+    """
+    Ingestion target for a Qdrant collection, using the payload layout of
+    langchain_qdrant.QdrantVectorStore.
+
+    Points are buffered and uploaded with client.upload_points in batches of
+    `upload_batch_size` over `upload_parallel` workers. With `bulk_load`, HNSW
+    indexing is switched off before the first upload and switched back on in
+    finish(), after the whole corpus, so Qdrant builds the index once instead
+    of after every batch or document. With `quantization` ("scalar" or
+    "binary") the collection keeps quantized copies of the vectors in RAM and
+    the originals on disk for rescoring; existing collections are updated in
+    flush().
+    The source and page payload fields are indexed (see PAYLOAD_INDEXES).
+    """
+
+    def __init__(self, client, collection_name, upload_batch_size=256, upload_parallel=1, bulk_load=False, quantization=None):
+        self.client = client
+        self.collection_name = collection_name
+        self.quantization = quantization
+        self.upload_batch_size = upload_batch_size
+        self.upload_parallel = upload_parallel
+        self.bulk_load = bulk_load
+        self._points = []
+        self._indexing_threshold = None
+        self._exists = None
+        self._indexed = False
+        self._unhashed_removed = False
+
+    def _collection_exists(self):
+        if not self._exists:
+            self._exists = self.client.collection_exists(self.collection_name)
+        return self._exists
+
+    def _ensure_payload_indexes(self):
+        """
+        Create any missing payload index on the source/page fields.
+        """
+        if self._indexed:
+            return
+        schema = self.client.get_collection(self.collection_name).payload_schema or {}
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            if field_name not in schema:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema,
+                    wait=True,
+                )
+                print(f"🗂️  Created payload index on '{field_name}'")
+        self._indexed = True
+
+    def _remove_unhashed(self):
+        """
+        Delete points without a content hash, left by the old from_documents
+        ingestion (which also stored absolute source paths). Sync can neither
+        match nor expire them, so they would stay as duplicates forever.
+        """
+        if self._unhashed_removed:
+            return
+        unhashed = Filter(must=[IsEmptyCondition(is_empty=PayloadField(key=f"{METADATA_KEY}.content_hash"))])
+        count = self.client.count(collection_name=self.collection_name, count_filter=unhashed, exact=True).count
+        if count:
+            self.client.delete(
+                collection_name=self.collection_name, points_selector=FilterSelector(filter=unhashed), wait=True
+            )
+            print(f"🧹 Deleted {count} points without a content hash from '{self.collection_name}'")
+        self._unhashed_removed = True
+
+    def stored_hashes(self, source):
+        """
+        Return {content_hash: point_id} for every point already stored for `source`.
+        The first call also removes legacy points without a hash.
+        """
+        if not self._collection_exists():
+            return {}
+        self._ensure_payload_indexes()
+        self._remove_unhashed()
+
+        scroll_filter = Filter(must=[FieldCondition(key=f"{METADATA_KEY}.source", match=MatchValue(value=source))])
+        found = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                with_payload=[f"{METADATA_KEY}.content_hash"],
+                with_vectors=False,
+                limit=256,
+                offset=offset,
+            )
+            for point in points:
+                chunk_hash = (point.payload.get(METADATA_KEY) or {}).get("content_hash")
+                if chunk_hash:
+                    found[chunk_hash] = point.id
+            if offset is None:
+                return found
+
+    def stored_sources(self):
+        """
+        Every source with points in the collection, read from the source payload index.
+        """
+        if not self._collection_exists():
+            return set()
+        self._ensure_payload_indexes()
+        facets = self.client.facet(
+            collection_name=self.collection_name, key=f"{METADATA_KEY}.source", limit=100_000, exact=True
+        )
+        return {hit.value for hit in facets.hits}
+
+    def add(self, ids, vectors, documents):
+        """
+        Queue points for upload, creating the collection on first use.
+        """
+        if not self._collection_exists():
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                # Quantized collections search the in-RAM codes and only read the
+                # originals from disk to rescore, so the originals need not stay in RAM
+                vectors_config=VectorParams(
+                    size=len(vectors[0]), distance=Distance.COSINE, on_disk=bool(self.quantization)
+                ),
+                quantization_config=quantization_config(self.quantization) if self.quantization else None,
+            )
+            self._exists = True
+            self._ensure_payload_indexes()
+
+        if self.bulk_load and self._indexing_threshold is None:
+            config = self.client.get_collection(self.collection_name).config.optimizer_config
+            self._indexing_threshold = config.indexing_threshold or 20000
+            self.client.update_collection(
+                collection_name=self.collection_name,
+                optimizers_config=OptimizersConfigDiff(indexing_threshold=0),
+            )
+            print(f"⏸️  Indexing paused on '{self.collection_name}' for bulk load")
+
+        self._points.extend(
+            PointStruct(id=pid, vector=vector, payload={CONTENT_KEY: doc.page_content, METADATA_KEY: doc.metadata})
+            for pid, vector, doc in zip(ids, vectors, documents)
+        )
+        if len(self._points) >= self.upload_batch_size * self.upload_parallel:
+            self._upload()
+
+    def _upload(self):
+        if not self._points:
+            return
+        self.client.upload_points(
+            collection_name=self.collection_name,
+            points=self._points,
+            batch_size=self.upload_batch_size,
+            parallel=self.upload_parallel,
+            wait=True,
+        )
+        self._points = []
+
+    def delete(self, ids):
+        self._upload()
+        self.client.delete(collection_name=self.collection_name, points_selector=PointIdsList(points=list(ids)))
+
+    def flush(self):
+        """
+        Upload buffered points and apply the quantization config. Called
+        after every document; HNSW indexing stays paused until finish().
+        """
+        self._upload()
+        if self.quantization and self._collection_exists():
+            config = self.client.get_collection(self.collection_name).config
+            if config.quantization_config is None:
+                self.client.update_collection(
+                    collection_name=self.collection_name,
+                    quantization_config=quantization_config(self.quantization),
+                )
+                print(f"🗜️  Enabled {self.quantization} quantization on '{self.collection_name}'")
+            if not config.params.vectors.on_disk:
+                self.client.update_collection(
+                    collection_name=self.collection_name,
+                    vectors_config={"": VectorParamsDiff(on_disk=True)},
+                )
+                print(f"💾 Moved the original vectors of '{self.collection_name}' to disk")
+
+    def finish(self):
+        """
+        Flush, then re-enable HNSW indexing after a bulk load. Call once after the corpus is synced.
+        """
+        self.flush()
+        if self._indexing_threshold is not None:
+            self.client.update_collection(
+                collection_name=self.collection_name,
+                optimizers_config=OptimizersConfigDiff(indexing_threshold=self._indexing_threshold),
+            )
+            print(f"▶️  Indexing resumed on '{self.collection_name}', HNSW index is being rebuilt")
+            self._indexing_threshold = None
+
+
+def parse_pdf_pages(pdf_path, source, start, stop, chunk_size, chunk_overlap):
+    """
+    Parse and split pages [start, stop) of a PDF. Runs in a worker process.
+
+    Returns (source, chunks); each chunk carries `source` and `page` metadata.
+    """
+    reader = PdfReader(pdf_path)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    pages = [
+        Document(page_content=reader.pages[page].extract_text() or "", metadata={"source": source, "page": page})
+        for page in range(start, stop)
+    ]
+    return source, splitter.split_documents(pages)
+
+
+def ordered_pool_map(pool, fn, tasks, max_in_flight):
+    """
+    Like pool.map, but submits lazily so at most `max_in_flight` results are pending.
+    """
+    pending = deque()
+    for args in tasks:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def source_name(pdf_path, root):
+    """
+    Source recorded for a PDF: its path relative to `root`, else its file name.
+    """
+    pdf_path = Path(pdf_path)
+    return pdf_path.relative_to(root).as_posix() if pdf_path.is_relative_to(root) else pdf_path.name
+
+
+def iter_corpus_chunks(pdf_paths, root, chunk_size=1000, chunk_overlap=200, pages_per_task=8, max_workers=None):
+    """
+    Parse a corpus of PDFs in a process pool and yield (source, chunks) per document.
+
+    Each document is split into ranges of `pages_per_task` pages, so large
+    PDFs are parsed on several cores. `source` is the path relative to
+    `root`. Consume each chunk iterator before advancing to the next document.
+    """
+    tasks = []
+    for pdf_path in pdf_paths:
+        source = source_name(pdf_path, root)
+        page_count = len(PdfReader(pdf_path).pages)
+        # At least one task per document, so empty PDFs still get their stale chunks removed
+        for start in range(0, max(page_count, 1), pages_per_task):
+            tasks.append((str(pdf_path), source, start, min(start + pages_per_task, page_count), chunk_size, chunk_overlap))
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = ordered_pool_map(pool, parse_pdf_pages, tasks, max_in_flight=2 * max_workers)
+        for source, group in groupby(results, key=lambda result: result[0]):
+            yield source, (doc for _, chunks in group for doc in chunks)
+
+
+def batched(iterable, size):
+    """
+    Yield lists of up to `size` items from `iterable`.
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def prefetched(iterable, size):
+    """
+    Consume `iterable` in a background thread, buffering at most `size` items.
+
+    Lets PDF parsing and splitting overlap with embedding and upserting while
+    keeping memory bounded.
+    """
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        buffer.put((item, None), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            buffer.put((done, None))
+        except Exception as e:
+            buffer.put((done, e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def sync_documents(target, embedding, documents, source, cache=None, batch_size=32, max_workers=4, prefetch=2,
+                   lexical_index=None):
+    """
+    Incrementally index the chunks of one source document.
+
+    Each chunk is keyed by the hash of its content: only chunks that are not
+    yet in `target` get embedded and upserted, and points whose hash no
+    longer appears in `documents` are deleted once the stream is exhausted.
+
+    `documents` may be a generator (see iter_corpus_chunks). It is consumed in
+    windows of `batch_size * max_workers` chunks, with up to `prefetch`
+    windows parsed ahead, and each window is embedded in batches over
+    `max_workers` threads, reusing vectors from `cache`.
+    `target` is a QdrantCollection or a NumpyVectorStore. A BM25Index passed
+    as `lexical_index` is synced from the same chunks, without embeddings.
+    Returns (added, deleted, kept) for `target`.
+    """
+    stored = target.stored_hashes(source)
+    lexical_stored = lexical_index.stored_hashes(source) if lexical_index is not None else {}
+    seen = set()
+    added = 0
+
+    for window in prefetched(batched(documents, batch_size * max_workers), prefetch):
+        new_docs = {}
+        new_lexical = {}
+        for doc in window:
+            chunk_hash = content_hash(doc.page_content)
+            if chunk_hash in seen:
+                continue
+            seen.add(chunk_hash)
+            doc.metadata["content_hash"] = chunk_hash
+            doc.metadata["source"] = source
+            if chunk_hash not in stored:
+                new_docs[chunk_hash] = doc
+            if lexical_index is not None and chunk_hash not in lexical_stored:
+                new_lexical[chunk_hash] = doc
+
+        if new_docs:
+            new_hashes = list(new_docs)
+            vectors = embed_chunks(
+                embedding,
+                [doc.page_content for doc in new_docs.values()],
+                new_hashes,
+                cache=cache,
+                batch_size=batch_size,
+                max_workers=max_workers,
+            )
+            target.add([point_id(source, h) for h in new_hashes], vectors, list(new_docs.values()))
+            added += len(new_hashes)
+
+        if new_lexical:
+            lexical_index.add([point_id(source, h) for h in new_lexical], list(new_lexical.values()))
+
+    stale_ids = [pid for h, pid in stored.items() if h not in seen]
+    if stale_ids:
+        target.delete(stale_ids)
+
+    target.flush()
+    if lexical_index is not None:
+        lexical_index.delete([pid for h, pid in lexical_stored.items() if h not in seen])
+        lexical_index.flush()
+    return added, len(stale_ids), len(seen) - added
+
+
+def remove_missing_sources(target, root, lexical_index=None):
+    """
+    Delete the chunks of every stored source whose file no longer exists under `root`.
+
+    Sources are only removed when their file is gone, so narrowing PDF_GLOB
+    does not drop documents. Returns [(source, deleted)].
+    """
+    sources = target.stored_sources()
+    if lexical_index is not None:
+        sources |= lexical_index.stored_sources()
+    removed = []
+    for source in sorted(sources):
+        if not (Path(root) / source).exists():
+            # Syncing an empty document deletes everything stored for the source
+            _, deleted, _ = sync_documents(target, None, [], source, lexical_index=lexical_index)
+            removed.append((source, deleted))
+    return removed
@@ -0,0 +1,73 @@
+import numpy as np
+from embedding_pipeline import content_hash, embed_chunks
+
+
+def maximal_marginal_relevance(query_vector, candidate_vectors, k=4, lambda_mult=0.5, relevance=None):
+    """
+    Pick up to `k` candidate rows, trading relevance to the query against
+    similarity to the rows already picked. Returns row indices in pick order.
+
+    `relevance` overrides the cosine similarity to `query_vector` as the
+    relevance term (one value per candidate, higher is better).
+
+    All pairwise similarities come from one matrix product; each greedy step
+    is then a vectorised max over the candidates.
+    """
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    if k <= 0 or not len(candidates):
+        return []
+    candidates = candidates / np.linalg.norm(candidates, axis=1, keepdims=True).clip(min=1e-12)
+    if relevance is None:
+        query = np.asarray(query_vector, dtype=np.float32)
+        relevance = candidates @ (query / max(np.linalg.norm(query), 1e-12))
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+def fused_relevance(results):
+    """
+    Min-max normalised scores of ranked (Document, score) pairs, in [0, 1].
+
+    Used as the MMR relevance term so the fused order (dense, BM25 and every
+    query rewrite) is kept and MMR only adds the redundancy penalty.
+    """
+    scores = np.array([score for _, score in results], dtype=np.float32)
+    spread = scores.max() - scores.min()
+    if spread <= 0:
+        return np.ones(len(scores), dtype=np.float32)
+    return (scores - scores.min()) / spread
+
+
+def mmr_rerank(embedding, query, results, k=4, lambda_mult=0.5, cache=None):
+    """
+    Re-rank (Document, score) pairs with maximal marginal relevance and keep `k`.
+
+    Relevance is the normalised score of each result (e.g. its RRF score),
+    not its cosine to `query`, which would throw away the lexical hits and
+    the other query rewrites. Chunk vectors come from the EmbeddingCache
+    filled during ingestion, so re-ranking usually embeds nothing.
+    The original scores are kept.
+    """
+    if len(results) <= 1:
+        return results[:k]
+    texts = [doc.page_content for doc, _ in results]
+    hashes = [doc.metadata.get("content_hash") or content_hash(text) for (doc, _), text in zip(results, texts)]
+    vectors = embed_chunks(embedding, texts, hashes, cache=cache)
+    order = maximal_marginal_relevance(
+        None, vectors, k=k, lambda_mult=lambda_mult, relevance=fused_relevance(results)
+    )
+    return [results[i] for i in order]
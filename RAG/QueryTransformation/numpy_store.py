@@ -0,0 +1,293 @@
+import json
+import os
+from pathlib import Path
+import numpy as np
+from langchain_core.documents import Document
+
+
+def top_k(scores, k):
+    """
+    Indices of the `k` highest scores, best first.
+    """
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class NumpyVectorStore:
+    """
+    In-process vector store backed by a memory-mapped float32 matrix.
+
+    Vectors are L2-normalised on insert, so a single matrix-vector product
+    gives the cosine similarity against every chunk. With `nlist > 0` the
+    matrix is partitioned with k-means (IVF) and a query only scans the
+    `nprobe` closest partitions.
+
+    With `quantization` set to "scalar" (int8 codes) or "binary" (one sign
+    bit per dimension), queries scan the compact in-RAM codes and only the
+    best `k * oversampling` candidates are rescored against the float32
+    matrix, which can then stay paged out on disk.
+
+    Files in `path`: vectors.f32 (row-major matrix), payloads.json (ids,
+    text and metadata per row), ivf.npz in IVF mode and quantized.npz in
+    quantized mode.
+    """
+
+    def __init__(self, path, embedding, nlist=0, nprobe=4, quantization=None, oversampling=4.0):
+        if quantization not in (None, "scalar", "binary"):
+            raise ValueError(f"Unknown quantization '{quantization}', expected 'scalar' or 'binary'")
+
+        self.path = Path(path)
+        self.embedding = embedding
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.quantization = quantization
+        self.oversampling = oversampling
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.ids = []
+        self.payloads = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._pending = []
+        self._dirty = False
+        self.centroids = None
+        self.assignments = None
+        self.codes = None
+        self.scale = None
+        self._load()
+
+    def _load(self):
+        payload_file = self.path / "payloads.json"
+        if not payload_file.exists():
+            return
+
+        with open(payload_file, "r") as f:
+            data = json.load(f)
+        self.ids = data["ids"]
+        self.payloads = data["payloads"]
+        if self.ids:
+            self.vectors = np.memmap(
+                self.path / "vectors.f32", dtype=np.float32, mode="r", shape=(len(self.ids), data["dim"])
+            )
+
+        ivf_file = self.path / "ivf.npz"
+        if self.nlist and ivf_file.exists():
+            ivf = np.load(ivf_file)
+            if len(ivf["centroids"]) == self.nlist and len(ivf["assignments"]) == len(self.ids):
+                self.centroids = ivf["centroids"]
+                self.assignments = ivf["assignments"]
+
+        quantized_file = self.path / "quantized.npz"
+        if self.quantization and quantized_file.exists():
+            quantized = np.load(quantized_file)
+            if str(quantized["kind"]) == self.quantization and len(quantized["codes"]) == len(self.ids):
+                self.codes = quantized["codes"]
+                self.scale = float(quantized["scale"])
+
+    def save(self):
+        """
+        Write the index to disk and re-open the matrix as a memory map.
+        """
+        self._consolidate()
+        vectors_file = self.path / "vectors.f32"
+        np.ascontiguousarray(self.vectors, dtype=np.float32).tofile(f"{vectors_file}.tmp")
+        os.replace(f"{vectors_file}.tmp", vectors_file)
+
+        with open(self.path / "payloads.json.tmp", "w") as f:
+            json.dump({"dim": self.dim, "ids": self.ids, "payloads": self.payloads}, f)
+        os.replace(self.path / "payloads.json.tmp", self.path / "payloads.json")
+
+        if self.nlist:
+            self._build_ivf()
+            np.savez(self.path / "ivf.npz", centroids=self.centroids, assignments=self.assignments)
+
+        if self.quantization:
+            self._quantize()
+            np.savez(self.path / "quantized.npz", codes=self.codes, scale=self.scale, kind=self.quantization)
+
+        if self.ids:
+            self.vectors = np.memmap(vectors_file, dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+        self._dirty = False
+
+    def flush(self):
+        """
+        Persist pending additions and deletions.
+        """
+        if self._dirty:
+            self.save()
+
+    def _consolidate(self):
+        """
+        Append vectors buffered by add() to the matrix in a single copy.
+        """
+        if not self._pending:
+            return
+        blocks = self._pending if not self.vectors.size else [self.vectors, *self._pending]
+        self.vectors = np.vstack(blocks)
+        self._pending = []
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1] if self.vectors.size else 0
+
+    def stored_hashes(self, source):
+        """
+        Return {content_hash: id} for every chunk stored for `source`.
+        """
+        return {
+            payload["metadata"]["content_hash"]: point_id
+            for point_id, payload in zip(self.ids, self.payloads)
+            if payload["metadata"].get("source") == source and payload["metadata"].get("content_hash")
+        }
+
+    def stored_sources(self):
+        """
+        Every source with chunks in the store.
+        """
+        return {payload["metadata"].get("source") for payload in self.payloads} - {None}
+
+    def add(self, ids, vectors, documents):
+        """
+        Append vectors with their ids and documents, replacing existing ids.
+        Call flush() to persist.
+        """
+        existing = set(self.ids)
+        self.delete([i for i in ids if i in existing])
+
+        new = np.asarray(vectors, dtype=np.float32)
+        new /= np.linalg.norm(new, axis=1, keepdims=True).clip(min=1e-12)
+        self._pending.append(new)
+        self.ids.extend(ids)
+        self.payloads.extend({"page_content": d.page_content, "metadata": d.metadata} for d in documents)
+        self.centroids = self.assignments = None
+        self.codes = None
+        self._dirty = True
+
+    def delete(self, ids):
+        """
+        Remove the rows with the given ids. Call flush() to persist.
+        """
+        drop = set(ids)
+        if not drop:
+            return
+        self._consolidate()
+        keep = [row for row, point_id in enumerate(self.ids) if point_id not in drop]
+        self.vectors = np.asarray(self.vectors[keep], dtype=np.float32).reshape(len(keep), self.dim)
+        self.ids = [self.ids[row] for row in keep]
+        self.payloads = [self.payloads[row] for row in keep]
+        self.centroids = self.assignments = None
+        self.codes = None
+        self._dirty = True
+
+    def _build_ivf(self, iterations=10, seed=0):
+        """
+        Spherical k-means over the stored vectors.
+        """
+        self._consolidate()
+        count = len(self.ids)
+        if count < self.nlist:
+            self.centroids = self.assignments = None
+            return
+
+        rng = np.random.default_rng(seed)
+        vectors = np.asarray(self.vectors)
+        centroids = vectors[rng.choice(count, self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _quantize(self):
+        """
+        Encode the stored vectors as int8 codes or packed sign bits.
+        """
+        self._consolidate()
+        vectors = np.asarray(self.vectors)
+        if self.quantization == "binary":
+            self.codes = np.packbits(vectors > 0, axis=1)
+            self.scale = 1.0
+        else:
+            # Normalised components rarely exceed the 99th percentile magnitude
+            self.scale = float(np.quantile(np.abs(vectors), 0.99)) / 127 if vectors.size else 1.0
+            self.scale = self.scale or 1.0
+            self.codes = np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def _approximate_scores(self, query, rows, block=65536):
+        """
+        Score the quantized codes against `query`; only the ranking is meaningful.
+        """
+        if self.codes is None:
+            self._quantize()
+        codes = self.codes if rows is None else self.codes[rows]
+
+        if self.quantization == "binary":
+            query_bits = np.packbits(query > 0)
+            return -np.bitwise_count(codes ^ query_bits).sum(axis=1, dtype=np.int32)
+
+        # Cast block by block so the float32 temporary stays bounded
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block):
+            scores[start:start + block] = codes[start:start + block].astype(np.float32) @ query
+        return scores
+
+    def _candidate_rows(self, query):
+        if not self.nlist:
+            return None
+        if self.centroids is None:
+            self._build_ivf()
+        if self.centroids is None:
+            return None
+        probes = np.argsort(self.centroids @ query)[::-1][:self.nprobe]
+        return np.flatnonzero(np.isin(self.assignments, probes))
+
+    def _source_rows(self, sources):
+        """
+        Sorted row numbers of the chunks belonging to `sources`.
+        """
+        sources = set(sources)
+        return np.array(
+            [row for row, payload in enumerate(self.payloads) if payload["metadata"].get("source") in sources],
+            dtype=np.int64,
+        )
+
+    def similarity_search_with_score_by_vector(self, vector, k=4, sources=None):
+        """
+        Top-k (Document, cosine similarity) pairs, optionally limited to chunks of `sources`.
+        """
+        if not self.ids:
+            return []
+        self._consolidate()
+
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+
+        rows = self._candidate_rows(query)
+        if sources is not None:
+            allowed = self._source_rows(sources)
+            rows = allowed if rows is None else np.intersect1d(rows, allowed)
+            if not len(rows):
+                return []
+        if self.quantization:
+            # Scan the quantized codes, then rescore the best candidates exactly
+            approximate = self._approximate_scores(query, rows)
+            candidates = top_k(approximate, max(k, int(k * self.oversampling)))
+            rows = np.sort(candidates if rows is None else rows[candidates])
+
+        scores = self.vectors @ query if rows is None else self.vectors[rows] @ query
+        top = top_k(scores, k)
+        top_rows = top if rows is None else rows[top]
+
+        return [
+            (Document(page_content=self.payloads[row]["page_content"], metadata=self.payloads[row]["metadata"]), float(score))
+            for row, score in zip(top_rows, scores[top])
+        ]
+
+    def similarity_search_with_score(self, query, k=4, sources=None):
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k=k, sources=sources)
@@ -1,87 +1,224 @@
 from pathlib import Path
 import os
+import time
+from functools import partial
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams
+from answer_generation import generate_answer
+from bm25_index import BM25Index
+from compression import compress_documents
+from embedding_pipeline import EmbeddingCache
+from ingestion import (
+    QdrantCollection, iter_corpus_chunks, quantized_search_params, remove_missing_sources, source_filter, sync_documents,
+)
+from mmr import mmr_rerank
+from numpy_store import NumpyVectorStore
+from query_cache import CachedQueryEmbeddings, MemoryEmbeddingCache, QueryCache
+from query_fanout import parallel_query_retrieval
 
-load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable is not set")
+def main():
+    load_dotenv()
 
-# Set your Google API key
-os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY environment variable is not set")
 
-pdf_path = Path(__file__).parent.parent / "DataSource" / "Embeddings & vector stores.pdf"
+    # Set your Google API key
+    os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
 
-# Initialize Qdrant client
-client = QdrantClient(url="http://localhost:6333")
-collection_name = "pdf_embeddings"
+    # Every PDF under DataSource matching PDF_GLOB is ingested
+    data_source = Path(__file__).parent.parent / "DataSource"
+    pdf_paths = sorted(data_source.glob(os.getenv("PDF_GLOB", "*.pdf")))
 
-# Initialize Gemini embeddings
-vector_embedding_model = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001"
-)
+    collection_name = "pdf_embeddings"
+
+    # "qdrant" uses the server from docker-compose.yml, "numpy" an in-process index
+    vector_backend = os.getenv("VECTOR_BACKEND", "qdrant")
+
+    # "scalar" (int8) or "binary" quantization with rescoring, unset for full precision
+    vector_quantization = os.getenv("VECTOR_QUANTIZATION") or None
+    quantization_oversampling = float(os.getenv("QUANTIZATION_OVERSAMPLING", "4.0"))
+    search_kwargs = {}
+    lexical_kwargs = {}
+
+    # Optional comma-separated list of sources (paths relative to DataSource) to search in
+    search_sources = [source.strip() for source in os.getenv("SEARCH_SOURCES", "").split(",") if source.strip()]
+
+    # Initialize Gemini embeddings
+    vector_embedding_model = GoogleGenerativeAIEmbeddings(
+        model="models/embedding-001"
+    )
+
+    # LLM used to rewrite the user query into several search queries
+    query_rewrite_llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-001")
+    query_rewrites = int(os.getenv("QUERY_REWRITES", "3"))
+    retrieval_k = int(os.getenv("RETRIEVAL_K", "2"))
+
+    # LLM that answers from the compressed context
+    answer_llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-001")
+
+    # Sentences scoring below this fraction of the best sentence score are
+    # dropped from the context (0 keeps every sentence)
+    compression_threshold = float(os.getenv("COMPRESSION_THRESHOLD", "0.8"))
+    # Sentence vectors are kept in a bounded in-memory LRU, not the on-disk chunk cache
+    sentence_cache = MemoryEmbeddingCache(maxsize=int(os.getenv("SENTENCE_CACHE_SIZE", "4096")))
+
+    # Local cache of chunk embeddings, keyed by (model name, chunk hash)
+    embedding_cache = EmbeddingCache(
+        os.getenv("EMBEDDING_CACHE_PATH", Path(__file__).parent / ".embedding_cache.sqlite3")
+    )
 
-try:
-    # Try to get collection info - if it exists
-    collection_info = client.get_collection(collection_name)
-    print(f"Collection '{collection_name}' already exists")
-    
-    # Use existing collection
-    qdrant = QdrantVectorStore(
-        client=client,
-        collection_name=collection_name,
-        embedding=vector_embedding_model,
+    # LRU/TTL cache for query embeddings and fused results of the retrieval loop
+    query_cache = QueryCache(
+        maxsize=int(os.getenv("QUERY_CACHE_SIZE", "256")),
+        ttl=float(os.getenv("QUERY_CACHE_TTL", "600")),
     )
-    
-except Exception as e:
-    print(f"Collection '{collection_name}' does not exist, creating new collection...")
-    
-    # Load and process documents
-    loader = PyPDFLoader(pdf_path)
-    docs = loader.load()
-    
-    # Split documents
-    doc_splitter = RecursiveCharacterTextSplitter(
+    query_embedding_model = CachedQueryEmbeddings(vector_embedding_model, query_cache)
+
+    if vector_backend == "numpy":
+        vector_store = NumpyVectorStore(
+            path=Path(__file__).parent / ".numpy_index" / collection_name,
+            embedding=query_embedding_model,
+            nlist=int(os.getenv("NUMPY_IVF_LISTS", "0")),
+            nprobe=int(os.getenv("NUMPY_IVF_PROBES", "4")),
+            quantization=vector_quantization,
+            oversampling=quantization_oversampling,
+        )
+        ingestion_target = vector_store
+        if search_sources:
+            search_kwargs["sources"] = search_sources
+    else:
+        # Initialize Qdrant client, over gRPC (port 6334 in docker-compose.yml) by default
+        client = QdrantClient(
+            url="http://localhost:6333",
+            grpc_port=6334,
+            prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true",
+        )
+        ingestion_target = QdrantCollection(
+            client,
+            collection_name,
+            upload_batch_size=int(os.getenv("QDRANT_UPLOAD_BATCH_SIZE", "256")),
+            upload_parallel=int(os.getenv("QDRANT_UPLOAD_WORKERS", "1")),
+            bulk_load=os.getenv("QDRANT_BULK_LOAD", "false").lower() == "true",
+            quantization=vector_quantization,
+        )
+        if vector_quantization:
+            search_kwargs["search_params"] = quantized_search_params(quantization_oversampling)
+        if search_sources:
+            # Served by the payload index on metadata.source
+            search_kwargs["filter"] = source_filter(search_sources)
+
+    # BM25 index over the same chunks, fused with dense results at query time
+    lexical_index = None
+    if os.getenv("HYBRID_SEARCH", "true").lower() == "true":
+        lexical_index = BM25Index(Path(__file__).parent / ".bm25_index" / collection_name)
+    lexical_weight = float(os.getenv("LEXICAL_WEIGHT", "1.0"))
+    if search_sources:
+        lexical_kwargs["sources"] = search_sources
+
+    # Over-fetch MMR_FETCH_K candidates and re-rank them with maximal marginal
+    # relevance, so overlapping chunks don't crowd out the final k. Off (0) by
+    # default: on the benchmark it still costs recall at MMR_LAMBDA=0.5.
+    mmr_fetch_k = int(os.getenv("MMR_FETCH_K", "0"))
+    mmr_rerank_stage = None
+    if mmr_fetch_k:
+        mmr_rerank_stage = partial(
+            mmr_rerank,
+            query_embedding_model,
+            lambda_mult=float(os.getenv("MMR_LAMBDA", "0.5")),
+            cache=embedding_cache,
+        )
+
+    # Page ranges are parsed and split in a process pool, and embedded while
+    # later pages are parsed. Only new or changed chunks are embedded, stale
+    # ones are removed.
+    corpus_chunks = iter_corpus_chunks(
+        pdf_paths,
+        root=data_source,
         chunk_size=1000,
         chunk_overlap=200,
+        pages_per_task=int(os.getenv("PDF_PAGES_PER_TASK", "8")),
+        max_workers=int(os.getenv("PDF_PARSE_WORKERS", "0")) or None,
     )
-    
-    splitted_docs = doc_splitter.split_documents(docs)
-    print(f"Number of documents after splitting: {len(splitted_docs)}")
-    
-    # Create new collection and store documents
-    qdrant = QdrantVectorStore.from_documents(
-        client=client,
-        documents=splitted_docs,
-        embedding=vector_embedding_model,
-        prefer_grpc=False,
-        collection_name=collection_name,
-    )
-    print(f"Created new collection '{collection_name}' and indexed documents")
+    try:
+        for source, documents in corpus_chunks:
+            added, deleted, kept = sync_documents(
+                target=ingestion_target,
+                embedding=vector_embedding_model,
+                documents=documents,
+                source=source,
+                cache=embedding_cache,
+                batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+                max_workers=int(os.getenv("EMBEDDING_WORKERS", "4")),
+                lexical_index=lexical_index,
+            )
+            print(f"'{source}' synced into '{collection_name}': {added} added, {deleted} deleted, {kept} unchanged")
+            if added or deleted:
+                query_cache.invalidate()
+
+        # Chunks of PDFs deleted from DataSource
+        for source, deleted in remove_missing_sources(ingestion_target, data_source, lexical_index=lexical_index):
+            print(f"'{source}' no longer exists, {deleted} chunks deleted from '{collection_name}'")
+            query_cache.invalidate()
+    finally:
+        if vector_backend != "numpy":
+            # Re-enables HNSW indexing once, after the whole corpus (QDRANT_BULK_LOAD)
+            ingestion_target.finish()
+
+    if vector_backend != "numpy":
+        vector_store = QdrantVectorStore(
+            client=client,
+            collection_name=collection_name,
+            embedding=query_embedding_model,
+        )
+
+    while True:
+        # Test the collection with a query
+        query = input("Enter your query: ")
+
+        if query.lower() in ["exit", "quit"]:
+            print("Exiting the program.")
+            break
+
+        start = time.perf_counter()
+        queries, results = parallel_query_retrieval(
+            vector_store, query_rewrite_llm, query,
+            n=query_rewrites, k=retrieval_k, cache=query_cache, search_kwargs=search_kwargs,
+            lexical_index=lexical_index, lexical_weight=lexical_weight, lexical_kwargs=lexical_kwargs,
+            fetch_k=mmr_fetch_k, rerank=mmr_rerank_stage,
+        )
+        print(f"\nRetrieved in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        print("\nSearch Queries:")
+        for q in queries:
+            print(f"- {q}")
 
-while True:
-    # Test the collection with a query
-    query = input("Enter your query: ")
+        print("\nSearch Results:")
+        for i, (doc, score) in enumerate(results, 1):
+            print(f"\nResult {i} (RRF Score: {score:.4f}):")
+            # print(f"Content: {doc.page_content}")
+            print(f"Source: {doc.metadata.get('source', 'Unknown')}, Page: {doc.metadata.get('page', 0) + 1}")
+            print(f"---------------------------------------------------------", end="\n")
 
-    if query.lower() in ["exit", "quit"]:
-        print("Exiting the program.")
-        break
+        # Retrieve -> compress -> answer
+        start = time.perf_counter()
+        context = results
+        if compression_threshold:
+            context = compress_documents(
+                query_embedding_model, query, results, threshold=compression_threshold, cache=sentence_cache
+            )
+        original_chars = sum(len(doc.page_content) for doc, _ in results)
+        context_chars = sum(len(doc.page_content) for doc, _ in context)
+        print(f"\nCompressed context {original_chars} -> {context_chars} chars in {(time.perf_counter() - start) * 1000:.1f} ms")
 
-    # llm_generate_query = 
+        start = time.perf_counter()
+        answer = generate_answer(answer_llm, query, [doc for doc, _ in context])
+        print(f"\n🤖 Answer ({(time.perf_counter() - start) * 1000:.0f} ms):\n{answer}")
 
-    results = qdrant.similarity_search_with_score(query, k=2)
 
-    print("\nSearch Results:")
-    for i, (doc, score) in enumerate(results, 1):
-        print(f"\nResult {i} (Similarity Score: {score:.4f}):")
-        # print(f"Content: {doc.page_content}")
-        # print(f"Source: {doc.metadata.get('source', 'Unknown')}")
-        # print(f"Page: {doc.metadata.get('page', 'Unknown') + 1}")
-        print(f"---------------------------------------------------------", end="\n")
\ No newline at end of file
+if __name__ == "__main__":
+    # Guarded so PDF parsing and Qdrant upload worker processes can re-import this file
+    main()
@@ -0,0 +1,128 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_query(text):
+    """
+    Normalise query text so trivially different spellings share a cache entry.
+    """
+    return re.sub(r"\s+", " ", text).strip().strip("?!.").strip().lower()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize=256, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MemoryEmbeddingCache:
+    """
+    Bounded in-memory stand-in for EmbeddingCache (same get_many/put_many).
+
+    For vectors that should not be persisted, such as the per-query sentence
+    embeddings of contextual compression.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600):
+        self.vectors = TTLCache(maxsize, ttl)
+
+    def get_many(self, model, hashes):
+        found = {}
+        for chunk_hash in hashes:
+            vector = self.vectors.get((model, chunk_hash))
+            if vector is not None:
+                found[chunk_hash] = vector
+        return found
+
+    def put_many(self, model, items):
+        for chunk_hash, vector in items:
+            self.vectors.put((model, chunk_hash), vector)
+
+
+class QueryCache:
+    """
+    Caches query embeddings and fused top-k results for the retrieval loop.
+
+    Keys combine the normalised query text with the collection version, so
+    bumping the version after ingestion invalidates every cached result.
+    """
+
+    def __init__(self, maxsize=256, ttl=600):
+        self.version = 0
+        self.embeddings = TTLCache(maxsize, ttl)
+        self.results = TTLCache(maxsize, ttl)
+
+    def invalidate(self):
+        """
+        Call after the collection changed.
+        """
+        self.version += 1
+        self.embeddings.clear()
+        self.results.clear()
+
+    def result_key(self, query, *params):
+        return (self.version, normalize_query(query), *params)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps a LangChain embedder so repeated embed_query calls hit the cache.
+
+    Subclasses Embeddings because QdrantVectorStore rejects anything else.
+    embed_documents and every other attribute are delegated unchanged.
+    """
+
+    def __init__(self, embedding, cache):
+        self.embedding = embedding
+        self.cache = cache
+
+    def embed_query(self, text):
+        key = normalize_query(text)
+        vector = self.cache.embeddings.get(key)
+        if vector is None:
+            vector = self.embedding.embed_query(text)
+            self.cache.embeddings.put(key, vector)
+        return vector
+
+    def embed_documents(self, texts):
+        return self.embedding.embed_documents(texts)
+
+    def __getattr__(self, name):
+        return getattr(self.embedding, name)
@@ -0,0 +1,99 @@
+import asyncio
+import re
+from embedding_pipeline import content_hash
+
+# A leading bullet or "1." / "1)" number the LLM may add despite the prompt.
+# The whitespace after it keeps "2.0 Flash" or "-1 values" intact
+LIST_MARKER = re.compile(r"^\s*(?:[-*]|\d+[.)])\s+")
+
+REWRITE_PROMPT = """
+You are an AI assistant that helps retrieve documents from a vector database.
+Rewrite the user query into {n} different search queries that cover different
+wordings and aspects of the same question.
+
+Rules:
+1. Return exactly {n} queries, one per line.
+2. Do not number the queries or add any other text.
+
+User query: {query}
+"""
+
+
+def generate_queries(llm, query, n=3):
+    """
+    Ask the LLM for `n` rewrites of `query`. The original query is always first.
+    """
+    if n <= 0:
+        return [query]
+
+    response = llm.invoke(REWRITE_PROMPT.format(n=n, query=query))
+    queries = [query]
+    for line in response.content.splitlines():
+        line = LIST_MARKER.sub("", line).strip()
+        if line and line.lower() not in {q.lower() for q in queries}:
+            queries.append(line)
+    return queries[:n + 1]
+
+
+def reciprocal_rank_fusion(result_lists, k=60, weights=None):
+    """
+    Merge ranked lists of (Document, score) with reciprocal rank fusion.
+
+    `weights` optionally scales each list's contribution. Documents are
+    de-duplicated by content hash. Returns (Document, rrf_score) pairs,
+    best first.
+    """
+    weights = weights or [1.0] * len(result_lists)
+    fused = {}
+    for results, weight in zip(result_lists, weights):
+        for rank, (doc, _) in enumerate(results, 1):
+            key = doc.metadata.get("content_hash") or content_hash(doc.page_content)
+            entry = fused.setdefault(key, [doc, 0.0])
+            entry[1] += weight / (k + rank)
+    return sorted(((doc, score) for doc, score in fused.values()), key=lambda item: item[1], reverse=True)
+
+
+async def search_all(store, queries, k, search_kwargs=None, lexical_index=None, lexical_kwargs=None):
+    """
+    Run one similarity search per query concurrently.
+
+    With a BM25Index, a lexical search per query runs alongside; its result
+    lists follow the dense ones.
+    """
+    search_kwargs = search_kwargs or {}
+    lexical_kwargs = lexical_kwargs or {}
+    searches = [asyncio.to_thread(store.similarity_search_with_score, q, k=k, **search_kwargs) for q in queries]
+    if lexical_index is not None:
+        searches += [asyncio.to_thread(lexical_index.search, q, k=k, **lexical_kwargs) for q in queries]
+    return await asyncio.gather(*searches)
+
+
+def parallel_query_retrieval(store, llm, query, n=3, k=2, cache=None, search_kwargs=None,
+                             lexical_index=None, lexical_weight=1.0, lexical_kwargs=None, fetch_k=None, rerank=None):
+    """
+    Fan the query out into `n` rewrites, search them concurrently and fuse the results.
+
+    `search_kwargs` are passed to every similarity_search_with_score call.
+    With a BM25Index, lexical results (searched with `lexical_kwargs`) are
+    fused in with `lexical_weight`.
+    With `fetch_k`, every search over-fetches `fetch_k` candidates and
+    `rerank(query, fused results, k)` (e.g. MMR) picks the final `k`.
+    With a QueryCache, repeated queries skip rewriting and searching entirely.
+    Returns (queries, fused results limited to `k`).
+    """
+    fetch_k = max(fetch_k or k, k)
+    key = cache.result_key(query, n, k, fetch_k, rerank is not None) if cache else None
+    if cache:
+        cached = cache.results.get(key)
+        if cached is not None:
+            return cached
+
+    queries = generate_queries(llm, query, n)
+    result_lists = asyncio.run(search_all(store, queries, fetch_k, search_kwargs, lexical_index, lexical_kwargs))
+    weights = [1.0] * len(queries) + [lexical_weight] * (len(result_lists) - len(queries))
+    fused = reciprocal_rank_fusion(result_lists, weights=weights)[:fetch_k]
+    result = queries, rerank(query, fused, k) if rerank else fused[:k]
+
+    if cache:
+        cache.results.put(key, result)
+    return result
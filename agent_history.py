@@ -0,0 +1,118 @@
+import json
+import os
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "8000"))
+# Most recent queries (with their steps) that always stay verbatim
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "2"))
+# Tool outputs longer than this are cut in the middle when they are recorded
+HISTORY_MAX_OUTPUT_CHARS = int(os.getenv("HISTORY_MAX_OUTPUT_CHARS", "4000"))
+# Each message of a folded turn is cut to this before it is summarized
+HISTORY_SUMMARY_MESSAGE_CHARS = 500
+
+SUMMARY_PROMPT = """
+You maintain the running summary of a conversation between a user and an AI assistant.
+Update the summary with the new part of the conversation below. Keep the user's goals,
+decisions, facts learned from tools (file names, paths, values) and open questions.
+Drop greetings, repetition and raw tool output. Answer with the summary text only.
+
+Current summary:
+{summary}
+
+New part of the conversation:
+{transcript}
+"""
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (about 4 characters per token), without an API call.
+    """
+    return len(text) // 4 + 1
+
+
+def elide(text, limit):
+    """
+    Keep the head and tail of `text` and replace the middle with a marker.
+    """
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    head = limit * 2 // 3
+    tail = limit - head
+    return f"{text[:head]}\n... [{len(text) - limit} characters elided] ...\n{text[-tail:]}"
+
+
+def message(role, text):
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def gemini_summarizer(model):
+    """
+    Summarizer for ConversationHistory that asks `model` to update the summary.
+    """
+    def summarize(summary, transcript):
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(empty)", transcript=transcript)
+        return model.generate_content(prompt).text.strip()
+    return summarize
+
+
+class ConversationHistory:
+    """
+    Messages for generate_content kept under a token budget.
+
+    Pinned messages (a system prompt sent as the first message) and the last
+    `keep_turns` queries stay verbatim. Tool outputs are cut when recorded, and
+    once the budget is exceeded older queries are folded into a running summary,
+    so each request stays about the same size however long the session runs.
+    """
+
+    def __init__(self, summarizer=None, pinned=None, token_budget=HISTORY_TOKEN_BUDGET,
+                 keep_turns=HISTORY_KEEP_TURNS, max_output_chars=HISTORY_MAX_OUTPUT_CHARS):
+        self.summarizer = summarizer
+        self.pinned = list(pinned or [])
+        self.token_budget = token_budget
+        self.keep_turns = max(1, keep_turns)
+        self.max_output_chars = max_output_chars
+        self.summary = ""
+        # One list of messages per user query
+        self.turns = []
+
+    def add_query(self, text):
+        self.turns.append([message("user", text)])
+
+    def add(self, role, text):
+        if not self.turns:
+            self.turns.append([])
+        self.turns[-1].append(message(role, text))
+
+    def add_observation(self, output, role="user"):
+        self.add(role, json.dumps({"step": "observe", "output": elide(output, self.max_output_chars)}))
+
+    def tokens(self):
+        return sum(estimate_tokens(m["parts"][0]["text"]) for m in self.contents(compact=False))
+
+    def contents(self, compact=True):
+        if compact:
+            self.compact()
+        summary = [message("user", f"Summary of the earlier conversation:\n{self.summary}")] if self.summary else []
+        return self.pinned + summary + [m for turn in self.turns for m in turn]
+
+    def compact(self):
+        """
+        Fold every turn older than the last `keep_turns` into the summary once
+        the budget is exceeded. Folding them all at once leaves room to grow,
+        so the summarizer runs every few turns rather than on every request.
+        Without a summarizer the old turns are dropped.
+        """
+        before = self.tokens()
+        if before <= self.token_budget or len(self.turns) <= self.keep_turns:
+            return
+
+        old, self.turns = self.turns[:-self.keep_turns], self.turns[-self.keep_turns:]
+        transcript = "\n".join(
+            f"{m['role']}: {elide(m['parts'][0]['text'], HISTORY_SUMMARY_MESSAGE_CHARS)}"
+            for turn in old for m in turn
+        )
+        if self.summarizer:
+            self.summary = self.summarizer(self.summary, transcript)
+        print(f"🗜️ Folded {len(old)} turn(s) into the summary: ~{before} -> ~{self.tokens()} tokens")
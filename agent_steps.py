@@ -0,0 +1,75 @@
+import json
+
+STRUCTURED_PROTOCOL = """
+You work in plan, action, observe mode, but every response is ONE JSON object
+that carries your reasoning together with the next action:
+- "plan": a short explanation of what the user wants and what you do next.
+- "tool" and "tool_input": the tool to call now and its input, when a tool is needed.
+- "result": the final answer for the user, once no more tools are needed.
+
+After a tool call you receive its output as {{"step": "observe", "output": "..."}}.
+Never respond with a plan alone: every response either calls a tool or gives the result.
+
+Available tools:
+{tools}
+"""
+
+
+def structured_prompt(instructions, available_tools):
+    """
+    System instruction for structured mode: the agent's own instructions plus the step protocol.
+    """
+    tools = "\n".join(f"- {name}: {tool['description']}" for name, tool in available_tools.items())
+    return instructions.strip() + "\n" + STRUCTURED_PROTOCOL.format(tools=tools)
+
+
+def step_schema(available_tools):
+    """
+    response_schema for one agent turn. Gemini emits the properties in
+    alphabetical order, so the plan is written before the tool call.
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "plan": {"type": "string"},
+            "result": {"type": "string", "nullable": True},
+            "tool": {"type": "string", "format": "enum", "enum": list(available_tools), "nullable": True},
+            "tool_input": {"type": "string", "nullable": True},
+        },
+        "required": ["plan"],
+    }
+
+
+def run_structured_turn(model, history, available_tools, max_steps=10):
+    """
+    Answer the last query in `history` (a ConversationHistory), recording every step in it.
+
+    Each model call returns the reasoning and either a tool call or the final
+    result, so a query costs one request per tool call plus one for the answer.
+    """
+    generation_config = {
+        "response_mime_type": "application/json",
+        "response_schema": step_schema(available_tools),
+    }
+    for calls in range(1, max_steps + 1):
+        response = model.generate_content(contents=history.contents(), generation_config=generation_config)
+        step = json.loads(response.text)
+        history.add("model", json.dumps(step))
+        print(f"🧠: {step.get('plan')}")
+
+        tool_name = step.get("tool")
+        if not tool_name:
+            if step.get("result"):
+                print(f"📊 {calls} model call(s)")
+                return step["result"]
+            # The schema only requires a plan, so ask again for a tool call or a result
+            history.add_observation("No tool was called and no result was given. Call a tool or give the result.")
+            continue
+
+        if tool_name in available_tools:
+            output = available_tools[tool_name]['fn'](step.get("tool_input"))
+        else:
+            output = f"Unknown tool: {tool_name}"
+        history.add_observation(output)
+
+    return f"Stopped after {max_steps} model calls without a result."
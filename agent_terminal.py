@@ -3,6 +3,8 @@ import google.generativeai as genai
 import os
 import subprocess
 from dotenv import load_dotenv
+from agent_history import ConversationHistory, gemini_summarizer
+from agent_steps import run_structured_turn, structured_prompt
 
 load_dotenv()
 
@@ -12,6 +14,10 @@ genai.configure(api_key=API_KEY)
 
 model = genai.GenerativeModel('gemini-2.0-flash-001')
 
+# "structured" (default): one schema-constrained model turn per tool call.
+# "steps": the original protocol, one request per start/plan/action step.
+AGENT_MODE = os.getenv("AGENT_MODE", "structured")
+
 def execute_command(command):
     # result = os.system(command)
     # return result
@@ -34,6 +40,23 @@ available_tools = {
     }
 }
 
+safety_rules = """
+- Carefully analyze user queries for safety - avoid dangerous commands.
+- Explain what the command does before executing it.
+- Provide a clear explanation of the command output after execution.
+- Never execute commands that could harm the system or compromise security.
+- If a command seems unsafe, respond with a warning instead of executing it.
+- Provide helpful explanations about shell commands, their syntax, and usage.
+- For complex tasks, break them down into multiple simpler commands.
+"""
+
+instructions = f"""
+You are an AI terminal assistant who helps users execute shell commands and manage their system.
+Choose relevant tools from the available tools and execute them safely.
+
+Rules:
+{safety_rules}"""
+
 system_prompt = f"""
 You are an AI terminal assistant who helps users execute shell commands and manage their system.
 You work in start, plan, action, observe mode.
@@ -41,16 +64,9 @@ For the given user query, analyze the input and break down the request step by s
 Choose relevant tools from the available tools and execute them safely.
 
 Rules:
-1. Follow the strict JSON output format as per Output schema.
-2. Always perform one step at a time and wait for next input.
-3. Carefully analyze user queries for safety - avoid dangerous commands.
-4. Explain what the command does before executing it.
-5. Provide a clear explanation of the command output after execution.
-6. Never execute commands that could harm the system or compromise security.
-7. If a command seems unsafe, respond with a warning instead of executing it.
-8. Provide helpful explanations about shell commands, their syntax, and usage.
-9. For complex tasks, break them down into multiple simpler commands.
-
+- Follow the strict JSON output format as per Output schema.
+- Always perform one step at a time and wait for next input.
+{safety_rules}
 Output Format:
 {{
     "step": "string",
@@ -79,43 +95,75 @@ Output: {{ "step": "observe", "output": "Filesystem      Size  Used Avail Use% M
 Output: {{ "step": "result", "content": "I ran the 'df -h' command to check available disk space. You have approximately 30GB free on your root (/) partition, which is 60% of its 50GB total capacity. Your /home partition has 70GB available out of 100GB total capacity. The '-h' flag displays the sizes in a human-readable format with GB units instead of bytes." }}
 """
 
-messages = [{"role": "user", "parts": [{"text": system_prompt}]}]
+def run_structured_mode():
+    """
+    One structured model turn per tool call, plus one for the result.
+    """
+    structured_model = genai.GenerativeModel(
+        'gemini-2.0-flash-001',
+        system_instruction=structured_prompt(instructions, available_tools),
+    )
+    history = ConversationHistory(summarizer=gemini_summarizer(model))
+
+    while True:
+        query = input("> ")
+        if query.lower() in ["exit", "quit"]:
+            print("Exiting the terminal assistant.")
+            break
+
+        history.add_query(query)
+        print(f"👀: {run_structured_turn(structured_model, history, available_tools)}")
 
-while True:
-    query = input("> ")
-    if query.lower() in ["exit", "quit"]:
-        print("Exiting the terminal assistant.")
-        break
 
-    messages.append({"role": "user", "parts": [{"text": f"Input: {query}\nOutput:"}]})
+def run_step_mode():
+    """
+    Original protocol: one model request per start/plan/action/observe/result step.
+    """
+    history = ConversationHistory(
+        summarizer=gemini_summarizer(model),
+        pinned=[{"role": "user", "parts": [{"text": system_prompt}]}],
+    )
 
     while True:
-        response = model.generate_content(
-            contents=messages,
-            generation_config={
-                "response_mime_type": "application/json",
-                # Consider defining response_schema for stricter JSON output
-            }
-        )
-
-        parsed_response = json.loads(response.candidates[0].content.parts[0].text)
-        messages.append({"role": "model", "parts": [{"text": json.dumps(parsed_response)}]})
-
-        if parsed_response.get("step") == "start" or parsed_response.get("step") == "plan":
-            print(f"🧠: {parsed_response.get('content')}")
-            continue
-
-        if parsed_response.get("step") == "action":
-            tool_name = parsed_response.get("function")
-            tool_input_param = parsed_response.get("input")
-
-            if tool_name in available_tools:
-                output = available_tools[tool_name]['fn'](tool_input_param)
-                # messages.append({"role": "model", "parts": [{"text": f"{{\"step\": \"observe\", \"output\": \"{result}\"}}" }]})
-                messages.append({"role": "model", "parts": [{"text": json.dumps({ "steps": "observe", "output": output}) }]})
+        query = input("> ")
+        if query.lower() in ["exit", "quit"]:
+            print("Exiting the terminal assistant.")
+            break
+
+        history.add_query(f"Input: {query}\nOutput:")
+
+        while True:
+            response = model.generate_content(
+                contents=history.contents(),
+                generation_config={
+                    "response_mime_type": "application/json",
+                    # Consider defining response_schema for stricter JSON output
+                }
+            )
+
+            parsed_response = json.loads(response.candidates[0].content.parts[0].text)
+            history.add("model", json.dumps(parsed_response))
+
+            if parsed_response.get("step") == "start" or parsed_response.get("step") == "plan":
+                print(f"🧠: {parsed_response.get('content')}")
                 continue
 
-        if parsed_response.get("step") == "result":
-            print(f"👀: {parsed_response.get('content')}")
-            break
+            if parsed_response.get("step") == "action":
+                tool_name = parsed_response.get("function")
+                tool_input_param = parsed_response.get("input")
+
+                if tool_name in available_tools:
+                    output = available_tools[tool_name]['fn'](tool_input_param)
+                    # messages.append({"role": "model", "parts": [{"text": f"{{\"step\": \"observe\", \"output\": \"{result}\"}}" }]})
+                    history.add_observation(output, role="model")
+                    continue
+
+            if parsed_response.get("step") == "result":
+                print(f"👀: {parsed_response.get('content')}")
+                break
+
 
+if AGENT_MODE == "steps":
+    run_step_mode()
+else:
+    run_structured_mode()
@@ -2,6 +2,9 @@ import json
 import os
 import google.generativeai as genai
 from dotenv import load_dotenv
+from agent_history import ConversationHistory, gemini_summarizer
+from agent_steps import run_structured_turn, structured_prompt
+from gemini_cache import CachedPrompt
 from tools import execute_command, execute_shell_command, create_project_structure, write_code_to_file, read_file
 
 load_dotenv()
@@ -12,6 +15,10 @@ genai.configure(api_key=API_KEY)
 model = genai.GenerativeModel('gemini-2.0-flash-001')
 # model = genai.GenerativeModel('gemini-2.5-pro-exp-03-25')
 
+# "structured" (default): one schema-constrained model turn per tool call.
+# "steps": the original protocol, one request per start/plan/action step.
+AGENT_MODE = os.getenv("AGENT_MODE", "structured")
+
 available_tools = {
     "execute_command": {
         "fn": execute_command,
@@ -35,13 +42,7 @@ available_tools = {
     }
 }
 
-system_prompt = f"""
-You are an AI terminal assistant designed to help users with software development, project scaffolding, and safe shell command execution through a terminal interface.
-
-You operate using the structured reasoning mode: start → plan → action → observe → result. Every task should be broken down step by step, and only one action is performed per cycle.
-
-Your primary role is to assist in full-stack development tasks, such as initializing projects, writing files, reading files, and executing terminal commands—with absolute regard for system safety.
-
+guidelines = """
 INTELLIGENCE INSTRUCTIONS:
 
 1. Understand the user's intent and break it down clearly.
@@ -65,8 +66,25 @@ COMMAND EXECUTION GUIDELINES:
    - Widely used
 6. Check if prerequisites are met before suggesting install/build commands.
 7. Default to common tools (npm, pip, git) and add context around their purpose.
+"""
+
+instructions = f"""
+You are an AI terminal assistant designed to help users with software development, project scaffolding, and safe shell command execution through a terminal interface.
+
+Your primary role is to assist in full-stack development tasks, such as initializing projects, writing files, reading files, and executing terminal commands—with absolute regard for system safety.
+
+{guidelines}
+Tool inputs are single strings; create_project_structure, write_code_to_file and read_file take a JSON string.
+"""
 
-AVAILABLE TOOLS:
+system_prompt = f"""
+You are an AI terminal assistant designed to help users with software development, project scaffolding, and safe shell command execution through a terminal interface.
+
+You operate using the structured reasoning mode: start → plan → action → observe → result. Every task should be broken down step by step, and only one action is performed per cycle.
+
+Your primary role is to assist in full-stack development tasks, such as initializing projects, writing files, reading files, and executing terminal commands—with absolute regard for system safety.
+
+{guidelines}AVAILABLE TOOLS:
 
 - execute_command: Execute a command on the operating system.
 - execute_shell_command: Execute a safe shell command.
@@ -113,44 +131,73 @@ Final Note:
 - Wait for confirmation before performing any irreversible actions.
 """
 
-messages = [{"role": "user", "parts": [{"text": system_prompt}]}]
+def run_structured_mode():
+    """
+    One structured model turn per tool call, plus one for the result.
+    """
+    cached_prompt = CachedPrompt(
+        'gemini-2.0-flash-001', "ai-coding-agent-structured", structured_prompt(instructions, available_tools)
+    )
+    history = ConversationHistory(summarizer=gemini_summarizer(model))
 
-while True:
-    query = input("\n> ")
-    if query.lower() in ["exit", "quit"]:
-        print("Exiting AI coding assistant.")
-        break
+    while True:
+        query = input("\n> ")
+        if query.lower() in ["exit", "quit"]:
+            print("Exiting AI coding assistant.")
+            break
+
+        history.add_query(query)
+        print(f"🤖: {run_structured_turn(cached_prompt.model(), history, available_tools)}")
 
-    messages.append({"role": "user", "parts": [{"text": f"Input: {query}\nOutput:"}]})
+
+def run_step_mode():
+    """
+    Original protocol: one model request per start/plan/action/observe/result step.
+    """
+    # The tool manual is cached once as the system instruction instead of being the first message
+    cached_prompt = CachedPrompt('gemini-2.0-flash-001', "ai-coding-agent-steps", system_prompt)
+    history = ConversationHistory(summarizer=gemini_summarizer(model))
 
     while True:
-        response = model.generate_content(
-            contents=messages,
-            generation_config={"response_mime_type": "application/json"}
-        )
+        query = input("\n> ")
+        if query.lower() in ["exit", "quit"]:
+            print("Exiting AI coding assistant.")
+            break
 
-        parsed_response = json.loads(response.candidates[0].content.parts[0].text)
-        messages.append({"role": "model", "parts": [{"text": json.dumps(parsed_response)}]})
+        history.add_query(f"Input: {query}\nOutput:")
 
-        print(f"-----Assistant Response:----------- /n {parsed_response}")
+        while True:
+            response = cached_prompt.model().generate_content(
+                contents=history.contents(),
+                generation_config={"response_mime_type": "application/json"}
+            )
 
-        step = parsed_response.get("step")
+            parsed_response = json.loads(response.candidates[0].content.parts[0].text)
+            history.add("model", json.dumps(parsed_response))
 
-        if step in ["start", "plan"]:
-            print(f"🧠: {parsed_response.get('content')}")
-            continue
+            print(f"-----Assistant Response:----------- /n {parsed_response}")
 
-        if step == "action":
-            fn_name = parsed_response.get("function")
-            fn_input = parsed_response.get("input")
+            step = parsed_response.get("step")
 
-            if fn_name in available_tools:
-                output = available_tools[fn_name]['fn'](fn_input)
-                messages.append({"role": "model", "parts": [{"text": json.dumps({"step": "observe", "output": output})}]})
+            if step in ["start", "plan"]:
+                print(f"🧠: {parsed_response.get('content')}")
                 continue
 
-        if step == "result":
-            print(f"🤖: {parsed_response.get('content')}")
-            break
+            if step == "action":
+                fn_name = parsed_response.get("function")
+                fn_input = parsed_response.get("input")
+
+                if fn_name in available_tools:
+                    output = available_tools[fn_name]['fn'](fn_input)
+                    history.add_observation(output, role="model")
+                    continue
+
+            if step == "result":
+                print(f"🤖: {parsed_response.get('content')}")
+                break
 
 
+if AGENT_MODE == "steps":
+    run_step_mode()
+else:
+    run_structured_mode()
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# Simulated model timings, also settable with the command line flags below
+CONFIG = {
+    "prefill_ms": float(os.getenv("FAKE_PREFILL_MS", "50")),
+    "prompt_token_ms": float(os.getenv("FAKE_PROMPT_TOKEN_MS", "0.5")),
+    "token_ms": float(os.getenv("FAKE_TOKEN_MS", "20")),
+    "tokens": int(os.getenv("FAKE_TOKENS", "32")),
+    "parallel": int(os.getenv("FAKE_PARALLEL", "4")),
+    "models": [m.strip() for m in os.getenv("FAKE_MODELS", "gemma3:1b").split(",") if m.strip()],
+}
+
+app = FastAPI()
+loaded_models = set()
+model_slots = {}
+
+
+def model_slot(model):
+    """
+    Like OLLAMA_NUM_PARALLEL: requests beyond `parallel` per model wait.
+    """
+    if model not in model_slots:
+        model_slots[model] = asyncio.Semaphore(CONFIG["parallel"])
+    return model_slots[model]
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def count_tokens(text):
+    return len(text.split())
+
+
+def prompt_tokens(body):
+    if "messages" in body:
+        return sum(count_tokens(m.get("content", "")) for m in body["messages"])
+    return count_tokens(body.get("prompt", "")) + count_tokens(body.get("system") or "")
+
+
+async def generate_tokens(body):
+    """
+    Simulate prefill, then yield one token per `token_ms`.
+    Returns the final statistics through the last yielded item.
+    """
+    n_prompt = prompt_tokens(body)
+    n_tokens = min(CONFIG["tokens"], (body.get("options") or {}).get("num_predict") or CONFIG["tokens"])
+    async with model_slot(body["model"]):
+        start = time.perf_counter()
+        await asyncio.sleep((CONFIG["prefill_ms"] + CONFIG["prompt_token_ms"] * n_prompt) / 1000)
+        prefilled = time.perf_counter()
+        for i in range(n_tokens):
+            await asyncio.sleep(CONFIG["token_ms"] / 1000)
+            yield f"tok{i} "
+        end = time.perf_counter()
+    loaded_models.add(body["model"])
+    yield {
+        "done": True,
+        "done_reason": "stop",
+        "total_duration": int((end - start) * 1e9),
+        "load_duration": 0,
+        "prompt_eval_count": n_prompt,
+        "prompt_eval_duration": int((prefilled - start) * 1e9),
+        "eval_count": n_tokens,
+        "eval_duration": int((end - prefilled) * 1e9),
+    }
+
+
+def chat_part(model, content, stats=None):
+    return {"model": model, "created_at": now(), "message": {"role": "assistant", "content": content},
+            **(stats or {"done": False})}
+
+
+def generate_part(model, content, stats=None):
+    return {"model": model, "created_at": now(), "response": content, **(stats or {"done": False})}
+
+
+async def respond(body, make_part, extra=None):
+    """
+    Answer a chat or generate request, streamed as NDJSON unless stream is false.
+    """
+    model = body["model"]
+    if body.get("stream", True):
+        async def lines():
+            async for item in generate_tokens(body):
+                if isinstance(item, dict):
+                    yield json.dumps(make_part(model, "", {**item, **(extra or {})})) + "\n"
+                else:
+                    yield json.dumps(make_part(model, item)) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    content = []
+    async for item in generate_tokens(body):
+        if isinstance(item, dict):
+            return make_part(model, "".join(content), {**item, **(extra or {})})
+        content.append(item)
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    if not body.get("messages"):
+        # An empty chat only loads the model
+        loaded_models.add(body["model"])
+        return chat_part(body["model"], "", {"done": True, "done_reason": "load"})
+    return await respond(body, chat_part)
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    body = await request.json()
+    context = body.get("context") or []
+    # Tokens already in the context are not prefilled again
+    new_tokens = list(range(len(context), len(context) + prompt_tokens(body) + CONFIG["tokens"]))
+    return await respond(body, generate_part, {"context": context + new_tokens})
+
+
+@app.post("/api/pull")
+async def pull(request: Request):
+    body = await request.json()
+    if body.get("model") not in CONFIG["models"]:
+        CONFIG["models"].append(body.get("model"))
+    return {"status": "success"}
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [{"model": m, "name": m, "size": 0, "digest": "fake"} for m in CONFIG["models"]]}
+
+
+@app.get("/api/ps")
+async def ps():
+    return {"models": [{"model": m, "name": m, "size": 0, "digest": "fake"} for m in sorted(loaded_models)]}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stand-in Ollama server with configurable latency, for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--prefill-ms", type=float, default=CONFIG["prefill_ms"], help="Fixed prefill time per request")
+    parser.add_argument("--prompt-token-ms", type=float, default=CONFIG["prompt_token_ms"], help="Extra prefill time per prompt token")
+    parser.add_argument("--token-ms", type=float, default=CONFIG["token_ms"], help="Time per generated token")
+    parser.add_argument("--tokens", type=int, default=CONFIG["tokens"], help="Tokens per reply")
+    parser.add_argument("--parallel", type=int, default=CONFIG["parallel"], help="Concurrent generations per model")
+    args = parser.parse_args()
+
+    CONFIG.update(
+        prefill_ms=args.prefill_ms, prompt_token_ms=args.prompt_token_ms, token_ms=args.token_ms,
+        tokens=args.tokens, parallel=args.parallel,
+    )
+    print(f"🧪 Fake Ollama on http://{args.host}:{args.port}: {CONFIG}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
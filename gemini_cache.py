@@ -0,0 +1,125 @@
+"""
+Gemini context caching for large static system prompts.
+
+The API only caches prompts of at least GEMINI_CACHE_MIN_TOKENS tokens. Today
+neither hitesh_sir_chatbot.py's persona (~1.9k tokens) nor ai_coding_agent.py's
+tool manual (~0.9k tokens) qualifies, so both run inline; caching takes effect
+once a prompt grows past the minimum.
+"""
+import datetime
+import hashlib
+import os
+import google.generativeai as genai
+from google.api_core import exceptions
+from agent_history import estimate_tokens
+
+# Set GEMINI_CONTEXT_CACHE=0 to always send the system instruction inline
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "1") != "0"
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", "3600"))
+# Extend the cache when it has less than this many seconds left
+GEMINI_CACHE_REFRESH = int(os.getenv("GEMINI_CACHE_REFRESH", "300"))
+# Smallest prompt the API accepts as cached content
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "4096"))
+
+
+class CachedPrompt:
+    """
+    A static system instruction registered once with Gemini context caching.
+
+    model() returns a GenerativeModel that refers to the cache by name, so the
+    instruction is not prefilled or billed as input again on each request. The
+    cache is found again by display name on the next run, and its TTL is
+    extended shortly before it expires. Instructions below the model's
+    minimum cache size are sent inline without trying to cache them, and so
+    is everything when caching is disabled or rejected.
+    """
+
+    def __init__(self, model_name, name, system_instruction, ttl=GEMINI_CACHE_TTL,
+                 refresh=GEMINI_CACHE_REFRESH, min_tokens=GEMINI_CACHE_MIN_TOKENS, enabled=GEMINI_CONTEXT_CACHE):
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.system_instruction = system_instruction
+        # The hash makes an edited prompt get a new cache instead of a stale one
+        digest = hashlib.sha256(system_instruction.encode()).hexdigest()[:12]
+        self.display_name = f"{name}-{digest}"
+        self.ttl = datetime.timedelta(seconds=ttl)
+        self.refresh = datetime.timedelta(seconds=refresh)
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+        self.cache = None
+        self._model = None
+
+    def model(self):
+        if not self.enabled:
+            return self.fallback()
+        try:
+            if self.cache is None:
+                if not self.large_enough():
+                    self.enabled = False
+                    return self.fallback()
+                self.cache = self.find() or self.create()
+                self._model = None
+            elif self.expires_soon():
+                self.extend()
+        except exceptions.GoogleAPIError as e:
+            print(f"⚠️ Context caching unavailable, sending the prompt inline: {e}")
+            self.enabled = False
+            self._model = None
+            return self.fallback()
+
+        if self._model is None:
+            self._model = genai.GenerativeModel.from_cached_content(self.cache)
+        return self._model
+
+    def fallback(self):
+        if self._model is None:
+            self._model = genai.GenerativeModel(self.model_name, system_instruction=self.system_instruction)
+        return self._model
+
+    def large_enough(self):
+        """
+        Check the instruction against the cache minimum before touching the
+        caching API. A local estimate rules out clearly small prompts for free;
+        count_tokens is only called for prompts that could plausibly qualify.
+        """
+        # The estimate assumes ~4 characters per token; allow it to be 25% low
+        tokens = estimate_tokens(self.system_instruction)
+        if tokens >= self.min_tokens * 3 // 4:
+            tokens = genai.GenerativeModel(self.model_name).count_tokens(self.system_instruction).total_tokens
+        if tokens < self.min_tokens:
+            print(f"ℹ️ '{self.display_name}' has about {tokens} tokens, below the {self.min_tokens}-token cache minimum; sending it inline")
+            return False
+        return True
+
+    def find(self):
+        for cache in genai.caching.CachedContent.list(page_size=100):
+            if cache.display_name == self.display_name and cache.model == self.model_name:
+                print(f"♻️ Reusing context cache {cache.name}")
+                self.cache = cache
+                if self.expires_soon():
+                    self.extend()
+                # extend() may have replaced an expired cache with a new one
+                return self.cache
+        return None
+
+    def create(self):
+        cache = genai.caching.CachedContent.create(
+            model=self.model_name,
+            display_name=self.display_name,
+            system_instruction=self.system_instruction,
+            ttl=self.ttl,
+        )
+        print(f"📦 Created context cache {cache.name} ({cache.usage_metadata.total_token_count} tokens)")
+        return cache
+
+    def expires_soon(self):
+        return self.cache.expire_time - datetime.datetime.now(datetime.timezone.utc) < self.refresh
+
+    def extend(self):
+        """
+        Push the expiry out by another TTL, or recreate the cache if it is already gone.
+        """
+        try:
+            self.cache.update(ttl=self.ttl)
+        except exceptions.NotFound:
+            self.cache = self.create()
+            self._model = None
@@ -2,6 +2,7 @@ import json
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
+from gemini_cache import CachedPrompt
 
 load_dotenv()
 
@@ -12,9 +13,6 @@ API_KEY = os.getenv("API_KEY")
 # Configure the API key globally
 genai.configure(api_key=API_KEY)
 
-# Initialize the Gemini Pro model
-model = genai.GenerativeModel('gemini-2.0-flash-001')
-
 # Create a prompt with the system instructions and user query
 system_prompt = """
 You are hitesh choudhary and a teacher by profession. you teach coding to various level of students, right from beginners to fols who are already writing great softwares. you have been teaching on for more than 10 year and now it is your passion to tach people coding. in past, you have worked in many companies and on various roles, such as cyber security related roles, iOS developer, tech consultant, backend developer.
@@ -92,14 +90,17 @@ These inputs and outputs reflect a friendly, helpful, and encouraging tone, ensu
 """
 
 
-messages = [{"role": "user", "parts": [{"text": system_prompt}]}]
+# The persona is registered once as cached content instead of being resent with every query
+persona = CachedPrompt('gemini-2.0-flash-001', "hitesh-sir-persona", system_prompt)
+
+messages = []
 
 # hero coding challenge kya hai?
 query = input("> ")
 messages.append({"role": "user", "parts": [{"text": f"Input: {query}\nOutput:"}]})
 
 while True:
-    response = model.generate_content(
+    response = persona.model().generate_content(
         contents=messages,
         generation_config={
             "response_mime_type": "application/json",
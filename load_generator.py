@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+import httpx
+import numpy as np
+
+
+async def send(client, url, message, stream):
+    """
+    One request; returns (status code, seconds to first byte/token, total seconds).
+    For streams the first byte is the first token event.
+    """
+    start = time.perf_counter()
+    first = None
+    try:
+        async with client.stream("POST", url, json=message) as response:
+            async for chunk in response.aiter_bytes():
+                if first is None and (not stream or b"event: token" in chunk):
+                    first = time.perf_counter() - start
+            status = response.status_code
+    except httpx.HTTPError:
+        status = "error"
+    total = time.perf_counter() - start
+    return status, first if first is not None else total, total
+
+
+async def run_load(base_url, model, rate, duration, stream=False, priority="interactive", poisson=True,
+                   unique=True, timeout=120.0):
+    """
+    Open-loop load: requests start at `rate` per second for `duration`
+    seconds regardless of how fast earlier ones finish, so overload shows up
+    as queueing and shedding instead of a slower send rate.
+    """
+    path = "chat/stream" if stream else "chat"
+    url = f"{base_url}/api/ollama/{model}/{path}?priority={priority}"
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        tasks = []
+        start = time.perf_counter()
+        next_at = start
+        i = 0
+        while next_at - start < duration:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            # Unique messages keep the gateway from coalescing or caching the load away
+            message = f"Load test request {i}" if unique else "Load test request"
+            tasks.append(asyncio.create_task(send(client, url, message, stream)))
+            i += 1
+            next_at += random.expovariate(rate) if poisson else 1.0 / rate
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def summarize(results, elapsed):
+    statuses = Counter(str(status) for status, _, _ in results)
+    ok = [(first, total) for status, first, total in results if status == 200]
+    summary = {
+        "requests": len(results),
+        "statuses": dict(statuses),
+        "throughput_rps": len(ok) / elapsed,
+    }
+    if ok:
+        firsts, totals = np.array(ok).T
+        for name, values in (("ttft", firsts), ("latency", totals)):
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summary[f"{name}_ms"] = {"p50": p50 * 1000, "p95": p95 * 1000, "p99": p99 * 1000, "max": values.max() * 1000}
+    return summary
+
+
+def print_summary(summary):
+    print(f"📨 {summary['requests']} requests, statuses: {summary['statuses']}")
+    print(f"🚀 Throughput: {summary['throughput_rps']:.2f} successful req/s")
+    for name in ("ttft", "latency"):
+        if f"{name}_ms" in summary:
+            p = summary[f"{name}_ms"]
+            print(f"⏱️ {name:>7}: p50 {p['p50']:8.1f} ms  p95 {p['p95']:8.1f} ms  p99 {p['p99']:8.1f} ms  max {p['max']:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the Ollama gateway at a target request rate")
+    parser.add_argument("--url", default="http://localhost:8000", help="Gateway base URL")
+    parser.add_argument("--model", default="gemma3:1b")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requests started per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep sending")
+    parser.add_argument("--stream", action="store_true", help="Use the SSE endpoint; TTFT is then the first token")
+    parser.add_argument("--priority", choices=["interactive", "batch"], default="interactive")
+    parser.add_argument("--constant", action="store_true", help="Evenly spaced instead of Poisson arrivals")
+    parser.add_argument("--same-prompt", action="store_true", help="Send identical prompts (exercises coalescing)")
+    parser.add_argument("--json", help="Also write the summary to this JSON file")
+    args = parser.parse_args()
+
+    results, elapsed = asyncio.run(run_load(
+        args.url, args.model, args.rate, args.duration, stream=args.stream, priority=args.priority,
+        poisson=not args.constant, unique=not args.same_prompt,
+    ))
+    summary = summarize(results, elapsed)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
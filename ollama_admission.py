@@ -0,0 +1,121 @@
+import asyncio
+import heapq
+import itertools
+import math
+
+# Lower value is served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is shed; `retry_after` is a hint in seconds.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionQueue:
+    """
+    Concurrency slots for one model with a bounded priority queue in front.
+
+    A request takes a free slot right away, otherwise it waits in the queue
+    until a slot is released to it (best priority first, FIFO within a
+    class) or until its class deadline passes, when it is shed. When the
+    queue is full, a new request displaces the newest waiter of a lower
+    class, or is shed itself if there is none.
+    """
+
+    def __init__(self, slots, max_queue=64, deadlines=None):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.deadlines = deadlines or {"interactive": 10.0, "batch": 120.0}
+        self.active = 0
+        self.shed = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        # Moving average of how long a request holds a slot
+        self._service_time = 1.0
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def retry_after(self):
+        """
+        Seconds until the current queue has likely drained.
+        """
+        return max(1, math.ceil(self._service_time * (len(self._waiters) + 1) / self.slots))
+
+    def _shed(self, message):
+        self.shed += 1
+        return Overloaded(message, self.retry_after())
+
+    async def acquire(self, priority="interactive"):
+        rank = PRIORITIES[priority]
+        if self.active < self.slots and not self._waiters:
+            self.active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            # With max_queue=0 there is never a waiter to displace
+            worst = max(self._waiters) if self._waiters else None
+            if worst is None or worst[0] <= rank:
+                raise self._shed("Request queue is full")
+            self._waiters.remove(worst)
+            heapq.heapify(self._waiters)
+            worst[2].set_exception(self._shed("Displaced by a higher priority request"))
+
+        future = asyncio.get_running_loop().create_future()
+        # The sequence number keeps FIFO order within a class, and makes
+        # max() above pick the newest waiter of the lowest class
+        entry = (rank, next(self._seq), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait([future], timeout=self.deadlines[priority])
+        except asyncio.CancelledError:
+            self._abandon(entry)
+            raise
+        if not future.done():
+            self._abandon(entry)
+            raise self._shed(f"Queued longer than the {priority} deadline of {self.deadlines[priority]:g}s")
+        # Raises Overloaded if the request was displaced
+        future.result()
+
+    def _abandon(self, entry):
+        future = entry[2]
+        if future.done() and not future.cancelled() and future.exception() is None:
+            # A slot was handed over just as the waiter gave up
+            self.release()
+            return
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+        future.cancel()
+
+    def release(self, held_for=None):
+        """
+        Return a slot, handing it straight to the best waiter if there is one.
+        """
+        if held_for is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * held_for
+        # After resize() shrank the slots, the slot is dropped instead
+        while self._waiters and self.active <= self.slots:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def resize(self, slots):
+        """
+        Change the number of slots, handing any new ones straight to waiters.
+        """
+        self.slots = slots
+        while self._waiters and self.active < self.slots:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
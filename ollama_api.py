@@ -1,25 +1,439 @@
-from fastapi import FastAPI
-from ollama import Client
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Literal
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from ollama import ResponseError
 from fastapi import Body
+from ollama_admission import AdmissionQueue, Overloaded
+from ollama_cache import ResponseCache, SingleFlight, is_deterministic, request_key
+from ollama_metrics import GatewayMetrics
+from ollama_pool import OllamaPool, full_model_name, is_retryable
+from ollama_sessions import SessionStore
 
-app = FastAPI()
+# Comma-separated Ollama hosts; requests are balanced over all of them
+OLLAMA_HOSTS = [h.strip() for h in os.getenv("OLLAMA_HOSTS", os.getenv("OLLAMA_HOST", "http://localhost:11434")).split(",") if h.strip()]
+DEFAULT_MODEL = "gemma3:1b"
 
-client = Client(
-    host="http://localhost:11434",
+# Models preloaded at startup (comma-separated), and how long Ollama keeps
+# them in memory after the last request
+OLLAMA_MODELS = [m.strip() for m in os.getenv("OLLAMA_MODELS", DEFAULT_MODEL).split(",") if m.strip()]
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Pull configured models that are missing locally (never re-pulls present ones)
+OLLAMA_PULL_MISSING = os.getenv("OLLAMA_PULL_MISSING", "true").lower() == "true"
+
+# Concurrent generations per model and host, e.g. OLLAMA_MODEL_CONCURRENCY="4"
+# or "gemma3:1b=4,llama3.2=1,*=2" ("*" is the default for unlisted models).
+# Keep it in line with OLLAMA_NUM_PARALLEL on the servers.
+OLLAMA_MODEL_CONCURRENCY = os.getenv("OLLAMA_MODEL_CONCURRENCY", "4")
+
+
+def parse_model_limits(value):
+    """
+    Parse OLLAMA_MODEL_CONCURRENCY into ({model: limit}, default limit).
+    """
+    limits, default = {}, 4
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model, _, limit = entry.rpartition("=")
+        if model in ("", "*"):
+            default = int(limit)
+        else:
+            limits[model] = int(limit)
+    return limits, default
+
+
+model_limits, default_model_limit = parse_model_limits(OLLAMA_MODEL_CONCURRENCY)
+
+# Requests beyond the slots wait in a bounded per-model queue. Interactive
+# requests go before batch ones, and anything still queued after its class
+# deadline is shed with a 429
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "64"))
+QUEUE_DEADLINES = {
+    "interactive": float(os.getenv("OLLAMA_INTERACTIVE_DEADLINE", "10")),
+    "batch": float(os.getenv("OLLAMA_BATCH_DEADLINE", "120")),
+}
+Priority = Literal["interactive", "batch"]
+admission_queues = {}
+
+
+def model_admission(model):
+    """
+    Admission queue bounding the in-flight generations for `model` across the
+    healthy hosts, so a surviving host is never sent more than its own limit
+    (the excess would queue inside Ollama, out of reach of priorities and
+    deadlines). With no healthy host, one host's worth is still admitted.
+    """
+    healthy_hosts = max(1, sum(backend.healthy for backend in pool.backends))
+    slots = model_limits.get(model, default_model_limit) * healthy_hosts
+    if model not in admission_queues:
+        admission_queues[model] = AdmissionQueue(slots=slots, max_queue=OLLAMA_MAX_QUEUE, deadlines=QUEUE_DEADLINES)
+    elif admission_queues[model].slots != slots:
+        admission_queues[model].resize(slots)
+    return admission_queues[model]
+
+
+# Identical concurrent chats share one generation; deterministic replies
+# (temperature=0 or a fixed seed) are cached
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("OLLAMA_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("OLLAMA_CACHE_TTL", "300")),
+)
+in_flight = SingleFlight()
+
+# Server-side chat sessions, evicted LRU beyond OLLAMA_MAX_SESSIONS or
+# after OLLAMA_SESSION_TTL idle seconds
+sessions = SessionStore(
+    max_sessions=int(os.getenv("OLLAMA_MAX_SESSIONS", "1000")),
+    ttl=float(os.getenv("OLLAMA_SESSION_TTL", "1800")),
 )
 
-client.pull("gemma3:1b", force=True)
+# Per-model latency, queue wait, TTFT, throughput and in-flight metrics
+gateway_metrics = GatewayMetrics()
+
+# One async client per host, so every request shares the same pool of
+# keep-alive connections to a host instead of opening its own
+pool = OllamaPool(
+    OLLAMA_HOSTS,
+    health_interval=float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10")),
+    model_limit=lambda model: model_limits.get(model, default_model_limit),
+    limits=httpx.Limits(
+        max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32")),
+        max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE", "16")),
+    ),
+    timeout=httpx.Timeout(float(os.getenv("OLLAMA_TIMEOUT", "300")), connect=5.0),
+)
+
+# Warmup state per host and configured model: pending, waiting for ollama,
+# pulling, loading, ready or failed
+model_status = {backend.host: {model: "pending" for model in OLLAMA_MODELS} for backend in pool.backends}
+
+
+async def warm_model(backend, model, local_models):
+    """
+    Pull `model` on `backend` if it is missing, then load it into memory with keep_alive.
+    """
+    status = model_status[backend.host]
+    try:
+        if full_model_name(model) not in local_models:
+            if not OLLAMA_PULL_MISSING:
+                status[model] = "failed: not available locally"
+                return
+            status[model] = "pulling"
+            print(f"⬇️ Pulling missing model {model} on {backend.host}")
+            await backend.client.pull(model)
+
+        status[model] = "loading"
+        # A chat without messages only loads the model
+        await backend.client.chat(model=model, messages=[], keep_alive=OLLAMA_KEEP_ALIVE)
+        backend.loaded_models.add(full_model_name(model))
+        status[model] = "ready"
+        print(f"✅ {model} loaded on {backend.host} (keep_alive={OLLAMA_KEEP_ALIVE})")
+    except (ResponseError, httpx.HTTPError, ConnectionError) as e:
+        status[model] = f"failed: {e}"
+        print(f"❌ Warmup of {model} on {backend.host} failed: {e}")
+
+
+async def warm_backend(backend, retry_delay=5.0):
+    """
+    Warm every configured model on one host, waiting for it to come up if
+    it is not reachable yet.
+    """
+    while True:
+        try:
+            local_models = {m.model for m in (await backend.client.list()).models}
+            break
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            for model in OLLAMA_MODELS:
+                model_status[backend.host][model] = "waiting for ollama"
+            print(f"❌ Ollama is not reachable at {backend.host}, retrying in {retry_delay:.0f}s: {e}")
+            await asyncio.sleep(retry_delay)
+    await asyncio.gather(*(warm_model(backend, model, local_models) for model in OLLAMA_MODELS))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm all hosts concurrently, without blocking startup
+    background = [asyncio.create_task(warm_backend(backend)) for backend in pool.backends]
+    background.append(asyncio.create_task(pool.health_loop()))
+    yield
+    for task in background:
+        task.cancel()
+    await pool.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request, exc):
+    """
+    Shed requests get a 429 with a hint when to retry.
+    """
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.get("/health")
+async def health():
+    """
+    Liveness: the process is up and serving.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness: 200 once every configured model is loaded on at least one
+    healthy host, 503 before.
+    """
+    healthy = [backend.host for backend in pool.backends if backend.healthy]
+    is_ready = all(
+        any(model_status[host][model] == "ready" for host in healthy) for model in OLLAMA_MODELS
+    )
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "models": model_status},
+    )
+
+
+@app.get("/api/ollama/hosts")
+async def hosts():
+    """
+    Health and routing state of every Ollama host.
+    """
+    return {backend.host: backend.status() for backend in pool.backends}
+
+
+@app.get("/api/ollama/cache")
+async def cache_stats():
+    """
+    Response cache and request coalescing counters.
+    """
+    return {
+        "hits": response_cache.hits,
+        "misses": response_cache.misses,
+        "coalesced": in_flight.coalesced,
+        "cached": len(response_cache),
+        "in_flight": len(in_flight),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Per-model gateway metrics in the Prometheus text format.
+    """
+    extra = {
+        "cache_hits_total": response_cache.hits,
+        "cache_misses_total": response_cache.misses,
+        "coalesced_total": in_flight.coalesced,
+    }
+    for model, admission in admission_queues.items():
+        extra[f'shed_total{{model="{model}"}}'] = admission.shed
+    for backend in pool.backends:
+        extra[f'host_outstanding{{host="{backend.host}"}}'] = backend.outstanding
+    return PlainTextResponse(gateway_metrics.exposition(extra))
+
+
+def chat_options(temperature=None, seed=None):
+    options = {"temperature": temperature, "seed": seed}
+    return {key: value for key, value in options.items() if value is not None}
+
+
+async def generate(model, messages, options, priority):
+    """
+    One upstream generation, bounded by the model's admission queue.
+    """
+    model_metrics = gateway_metrics.model(model)
+    # Wait for a free slot, then yield the event loop while Ollama generates
+    async with model_metrics.slot(model_admission(model), priority):
+        # Non-streaming chats are idempotent, so a failed host is retried on another
+        response = await pool.call(model, lambda client: client.chat(
+            model=model,
+            messages=messages,
+            options=options or None,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        ))
+    model_metrics.observe_response(response)
+    return response['message']['content']
+
 
 @app.post("/api/ollama/{model_name}/chat")
-async def chat(model_name: str, message: str = Body(..., description="Chat message")):
+async def chat(model_name: str, message: str = Body(..., description="Chat message"),
+               temperature: float | None = None, seed: int | None = None, priority: Priority = "interactive"):
     """
     Chat with the specified Ollama model.
     """
-    # Assuming you have a function to handle the chat logic
-    response = await client.chat(
-        model=model_name or "gemma3:1b",
-        messages=[{"role": "user", "content": message}],
+    model = model_name or DEFAULT_MODEL
+    messages = [{"role": "user", "content": message}]
+    options = chat_options(temperature, seed)
+    key = request_key(model, messages, options)
+
+    with gateway_metrics.model(model).request():
+        cacheable = is_deterministic(options)
+        if cacheable:
+            content = response_cache.get(key)
+            if content is not None:
+                return content
+
+        # Only requests of the same priority share a flight, so an interactive
+        # request never waits in the batch queue behind a batch leader
+        content = await in_flight.do((key, priority), lambda: generate(model, messages, options, priority))
+        if cacheable:
+            response_cache.put(key, content)
+        return content
+
+
+def sse_event(event, data):
+    """
+    Format one server-sent event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_chat(request, model, messages, priority):
+    """
+    Forward Ollama's token stream as server-sent events.
+
+    The first step only waits for admission and yields None, so the caller
+    can still answer with a 429 before the stream starts.
+    Closing the Ollama stream closes its HTTP connection, which makes Ollama
+    stop generating, so a client that goes away frees its slot right away.
+    """
+    model_metrics = gateway_metrics.model(model)
+    with model_metrics.request() as outcome:
+        first_token = False
+        async with model_metrics.slot(model_admission(model), priority):
+            yield None
+            try:
+                stream = pool.stream(model, lambda client: client.chat(
+                    model=model, messages=messages, stream=True, keep_alive=OLLAMA_KEEP_ALIVE,
+                ))
+                try:
+                    async for part in stream:
+                        if await request.is_disconnected():
+                            print(f"🔌 Client disconnected, cancelling {model} generation")
+                            outcome["status"] = "cancelled"
+                            break
+                        if part["message"]["content"]:
+                            if not first_token:
+                                first_token = True
+                                model_metrics.ttft.observe(time.perf_counter() - outcome["start"])
+                            yield sse_event("token", {"content": part["message"]["content"]})
+                        if part["done"]:
+                            model_metrics.observe_response(part)
+                            yield sse_event("done", {"done_reason": part.get("done_reason"), "eval_count": part.get("eval_count")})
+                finally:
+                    await stream.aclose()
+            except ResponseError as e:
+                outcome["status"] = "error"
+                yield sse_event("error", {"error": e.error, "status_code": e.status_code})
+            except (httpx.TransportError, ConnectionError) as e:
+                # Every host failed after the 200 was sent, so report it in the stream
+                outcome["status"] = "error"
+                yield sse_event("error", {"error": f"No Ollama host reachable: {e}", "status_code": 502})
+
+
+@app.post("/api/ollama/{model_name}/chat/stream")
+async def chat_stream(request: Request, model_name: str, message: str = Body(..., description="Chat message"),
+                      priority: Priority = "interactive"):
+    """
+    Stream the reply of the specified Ollama model as server-sent events.
+    """
+    model = model_name or DEFAULT_MODEL
+    events = stream_chat(request, model, [{"role": "user", "content": message}], priority)
+    # Raises Overloaded (429) if the request is shed while queued
+    await anext(events)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    print(f'🤖 : {response}')
-    return response['message']['content']
 
+
+@app.post("/api/ollama/{model_name}/sessions")
+async def create_session(model_name: str, system: str | None = Body(None, description="Optional system prompt")):
+    """
+    Start a server-side chat session with the specified Ollama model.
+    """
+    session = sessions.create(model_name or DEFAULT_MODEL, system)
+    return {"session_id": session.id, "model": session.model}
+
+
+def get_session(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    return session
+
+
+@app.post("/api/ollama/sessions/{session_id}/chat")
+async def session_chat(session_id: str, message: str = Body(..., description="Chat message"),
+                       priority: Priority = "interactive"):
+    """
+    Continue a session. Only the new message is sent: Ollama resumes from the
+    context it returned for the previous turn, on the host that still holds
+    it in its KV cache, so earlier turns are not prefilled again.
+    """
+    session = get_session(session_id)
+    model = session.model
+    model_metrics = gateway_metrics.model(model)
+
+    with model_metrics.request():
+        # Turns of one session run one at a time, each extends the previous context
+        async with session.lock:
+            served = {}
+
+            async def turn(client):
+                response = await client.generate(
+                    model=model,
+                    prompt=message,
+                    # The system prompt is part of the context after the first turn
+                    system=session.system if session.context is None else None,
+                    context=session.context,
+                    keep_alive=OLLAMA_KEEP_ALIVE,
+                )
+                served["host"] = pool.host_of(client)
+                return response
+
+            async with model_metrics.slot(model_admission(model), priority):
+                response = await pool.call(model, turn, prefer=session.host)
+            model_metrics.observe_response(response)
+
+            session.context = response.get("context")
+            session.host = served["host"]
+            session.last_prompt_eval_count = response.get("prompt_eval_count")
+            session.messages += [
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": response["response"]},
+            ]
+            return response["response"]
+
+
+@app.get("/api/ollama/sessions/{session_id}")
+async def read_session(session_id: str):
+    """
+    Transcript and cache statistics of a session.
+    """
+    return get_session(session_id).summary()
+
+
+@app.delete("/api/ollama/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    return {"deleted": session_id}
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+
+def request_key(model, messages, options=None):
+    """
+    Stable key for a (model, messages, options) chat request.
+    """
+    payload = json.dumps([model, messages, options or {}], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(options):
+    """
+    Only greedy or seeded generations return the same reply for the same request.
+    """
+    options = options or {}
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache whose entries also expire after `ttl` seconds.
+
+    Used from the event loop only, so it needs no lock.
+    """
+
+    def __init__(self, maxsize=512, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one upstream call.
+
+    The first caller starts the call as a task; callers arriving while it
+    runs await the same task. A caller that goes away does not cancel the
+    call for the others; it is only cancelled once nobody waits for it.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+
+    async def do(self, key, fn):
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = [asyncio.ensure_future(fn()), 0]
+            call[0].add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            call[1] -= 1
+            if not call[1] and not task.done():
+                task.cancel()
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from ollama_admission import Overloaded
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram in the Prometheus style (cumulative on export).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def exposition(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class ModelMetrics:
+    """
+    Hot-path measurements for one model.
+    """
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.queue_wait = Histogram()
+        self.ttft = Histogram()
+        self.prompt_eval = Histogram()
+        self.tokens_per_second = Histogram(TOKENS_PER_SECOND_BUCKETS)
+        self.requests = Counter()
+        self.queued = 0
+        self.in_flight = 0
+
+    @contextmanager
+    def request(self):
+        """
+        Count a request as ok, shed, error or cancelled, and time the successful ones.
+
+        Yields a dict with the start time; set its "status" to report a
+        handled failure.
+        """
+        outcome = {"status": "ok", "start": time.perf_counter()}
+        try:
+            yield outcome
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome["status"] = "cancelled"
+            raise
+        except Overloaded:
+            outcome["status"] = "shed"
+            raise
+        except BaseException:
+            outcome["status"] = "error"
+            raise
+        finally:
+            self.requests[outcome["status"]] += 1
+            if outcome["status"] == "ok":
+                self.latency.observe(time.perf_counter() - outcome["start"])
+
+    @asynccontextmanager
+    async def slot(self, admission, priority="interactive"):
+        """
+        Acquire a slot from an AdmissionQueue, recording the queue wait and in-flight count.
+        """
+        self.queued += 1
+        start = time.perf_counter()
+        try:
+            await admission.acquire(priority)
+        finally:
+            self.queued -= 1
+        acquired = time.perf_counter()
+        self.queue_wait.observe(acquired - start)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            admission.release(time.perf_counter() - acquired)
+
+    def observe_response(self, response):
+        """
+        Record Ollama's own timings from a final (done) response; durations are in ns.
+        """
+        if response.get("eval_count") and response.get("eval_duration"):
+            self.tokens_per_second.observe(response["eval_count"] / (response["eval_duration"] / 1e9))
+        if response.get("prompt_eval_duration") is not None:
+            self.prompt_eval.observe(response["prompt_eval_duration"] / 1e9)
+
+
+class GatewayMetrics:
+    """
+    Per-model metrics, exported in the Prometheus text format.
+    """
+
+    def __init__(self, prefix="ollama_gateway"):
+        self.prefix = prefix
+        self.models = {}
+
+    def model(self, name):
+        if name not in self.models:
+            self.models[name] = ModelMetrics()
+        return self.models[name]
+
+    def exposition(self, extra=None):
+        """
+        Render every metric. `extra` adds gateway-wide samples as
+        {name or name{labels}: value}; names ending in _total are counters.
+        """
+        p = self.prefix
+        lines = []
+        histograms = {
+            "request_seconds": "latency",
+            "queue_wait_seconds": "queue_wait",
+            "time_to_first_token_seconds": "ttft",
+            "prompt_eval_seconds": "prompt_eval",
+            "tokens_per_second": "tokens_per_second",
+        }
+        for metric, attribute in histograms.items():
+            lines.append(f"# TYPE {p}_{metric} histogram")
+            for model, metrics in self.models.items():
+                lines.extend(getattr(metrics, attribute).exposition(f"{p}_{metric}", f'model="{model}"'))
+
+        lines.append(f"# TYPE {p}_requests_total counter")
+        for model, metrics in self.models.items():
+            for status, count in metrics.requests.items():
+                lines.append(f'{p}_requests_total{{model="{model}",status="{status}"}} {count}')
+
+        for gauge in ("in_flight", "queued"):
+            lines.append(f"# TYPE {p}_{gauge} gauge")
+            for model, metrics in self.models.items():
+                lines.append(f'{p}_{gauge}{{model="{model}"}} {getattr(metrics, gauge)}')
+
+        typed = set()
+        for name, value in (extra or {}).items():
+            base = name.split("{")[0]
+            if base not in typed:
+                typed.add(base)
+                lines.append(f"# TYPE {p}_{base} {'counter' if base.endswith('_total') else 'gauge'}")
+            lines.append(f"{p}_{name} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,184 @@
+import asyncio
+import time
+import httpx
+from ollama import AsyncClient, ResponseError
+
+
+def full_model_name(model):
+    """
+    Ollama lists untagged models under ":latest".
+    """
+    return model if ":" in model else f"{model}:latest"
+
+
+def is_retryable(error):
+    """
+    Transport failures and server-side errors are worth retrying on another host.
+    """
+    if isinstance(error, ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (httpx.TransportError, ConnectionError))
+
+
+class OllamaBackend:
+    """
+    One Ollama host with its own pooled client and routing state.
+    """
+
+    def __init__(self, host, **client_kwargs):
+        self.host = host
+        self.client = AsyncClient(host=host, **client_kwargs)
+        self.outstanding = 0
+        # Outstanding requests per (full) model name on this host
+        self.model_outstanding = {}
+        self.healthy = True
+        self.loaded_models = set()
+        self.last_error = None
+        self.checked_at = None
+
+    def status(self):
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "outstanding_by_model": {m: n for m, n in sorted(self.model_outstanding.items()) if n},
+            "loaded_models": sorted(self.loaded_models),
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+        }
+
+
+class OllamaPool:
+    """
+    Routes requests over several Ollama hosts.
+
+    Hosts that already have the model loaded are preferred (model affinity)
+    until they reach the per-host limit for that model, then the other hosts
+    take over; ties are broken by the fewest outstanding requests. A background task
+    polls every host's /api/ps, which both checks health and refreshes the
+    loaded models. Failed requests are retried on the next best host.
+    """
+
+    def __init__(self, hosts, health_interval=10.0, model_limit=None, **client_kwargs):
+        self.backends = [OllamaBackend(host, **client_kwargs) for host in hosts]
+        self.health_interval = health_interval
+        # model -> concurrent generations one host should run (None = unlimited)
+        self.model_limit = model_limit or (lambda model: None)
+
+    def ranked(self, model, exclude=(), prefer=None):
+        """
+        Candidate backends for `model`, best first. A healthy `prefer` host
+        comes first; unhealthy hosts come last so a request still has
+        somewhere to go if every check failed. Hosts already at the per-host
+        limit for `model` lose their affinity and rank behind the others.
+        """
+        limit = self.model_limit(model)
+        model = full_model_name(model)
+        candidates = [b for b in self.backends if b not in exclude]
+
+        def saturated(b):
+            return limit is not None and b.model_outstanding.get(model, 0) >= limit
+
+        return sorted(
+            candidates,
+            key=lambda b: (not b.healthy, b.host != prefer, saturated(b), model not in b.loaded_models, b.outstanding),
+        )
+
+    def acquire(self, backend, model):
+        model = full_model_name(model)
+        backend.outstanding += 1
+        backend.model_outstanding[model] = backend.model_outstanding.get(model, 0) + 1
+
+    def release(self, backend, model):
+        model = full_model_name(model)
+        backend.outstanding -= 1
+        backend.model_outstanding[model] -= 1
+
+    def host_of(self, client):
+        return next(b.host for b in self.backends if b.client is client)
+
+    def mark_failed(self, backend, error):
+        backend.healthy = False
+        backend.last_error = str(error)
+        print(f"⚠️ Ollama host {backend.host} failed: {error}")
+
+    async def call(self, model, fn, prefer=None):
+        """
+        Run `await fn(client)` on the best backend for `model`, retrying
+        retryable errors once on every other backend.
+        """
+        tried = []
+        while True:
+            backend = self.ranked(model, exclude=tried, prefer=prefer)[0]
+            self.acquire(backend, model)
+            try:
+                result = await fn(backend.client)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.mark_failed(backend, e)
+                tried.append(backend)
+                if len(tried) == len(self.backends):
+                    raise
+                continue
+            finally:
+                self.release(backend, model)
+            backend.loaded_models.add(full_model_name(model))
+            return result
+
+    async def stream(self, model, fn):
+        """
+        Yield the parts of the stream opened by `fn(client)` on the best
+        backend. Opening is retried on other backends until the first part
+        arrives; after that a failure is passed on, since tokens were sent.
+        """
+        tried = []
+        while True:
+            backend = self.ranked(model, exclude=tried)[0]
+            self.acquire(backend, model)
+            try:
+                stream = await fn(backend.client)
+                try:
+                    first = await anext(stream)
+                except Exception as e:
+                    await stream.aclose()
+                    if not is_retryable(e):
+                        raise
+                    self.mark_failed(backend, e)
+                    tried.append(backend)
+                    if len(tried) == len(self.backends):
+                        raise
+                    continue
+
+                backend.loaded_models.add(full_model_name(model))
+                try:
+                    yield first
+                    async for part in stream:
+                        yield part
+                finally:
+                    await stream.aclose()
+                return
+            finally:
+                self.release(backend, model)
+
+    async def check(self, backend):
+        try:
+            running = await backend.client.ps()
+        except (ResponseError, httpx.HTTPError, ConnectionError) as e:
+            if backend.healthy:
+                self.mark_failed(backend, e)
+        else:
+            if not backend.healthy:
+                print(f"✅ Ollama host {backend.host} is healthy again")
+            backend.healthy = True
+            backend.last_error = None
+            backend.loaded_models = {m.model for m in running.models}
+        backend.checked_at = time.time()
+
+    async def health_loop(self):
+        while True:
+            await asyncio.gather(*(self.check(backend) for backend in self.backends))
+            await asyncio.sleep(self.health_interval)
+
+    async def close(self):
+        for backend in self.backends:
+            await backend.client.close()
@@ -0,0 +1,81 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+
+class ChatSession:
+    """
+    Server-side conversation state for one client.
+
+    `context` holds the token context Ollama returned for the previous turn,
+    so the next turn only sends the new message. `host` pins follow-up turns
+    to the Ollama host whose KV cache already holds that context.
+    """
+
+    def __init__(self, model, system=None):
+        self.id = uuid.uuid4().hex
+        self.model = model
+        self.system = system
+        self.context = None
+        self.host = None
+        self.messages = []
+        self.last_prompt_eval_count = None
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def summary(self):
+        return {
+            "session_id": self.id,
+            "model": self.model,
+            "host": self.host,
+            "turns": len(self.messages) // 2,
+            "context_tokens": len(self.context or []),
+            "last_prompt_eval_count": self.last_prompt_eval_count,
+            "messages": self.messages,
+        }
+
+
+class SessionStore:
+    """
+    Bounded session store: least recently used sessions are evicted beyond
+    `max_sessions`, and sessions idle for `ttl` seconds expire.
+    """
+
+    def __init__(self, max_sessions=1000, ttl=1800):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.evicted = 0
+        self._sessions = OrderedDict()
+
+    def _evict(self):
+        deadline = time.monotonic() - self.ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used >= deadline and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def create(self, model, system=None):
+        session = ChatSession(model, system)
+        self._sessions[session.id] = session
+        self._evict()
+        return session
+
+    def get(self, session_id):
+        """
+        Return the session and mark it as used, or None if unknown or expired.
+        """
+        self._evict()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id):
+        return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
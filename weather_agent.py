@@ -3,6 +3,8 @@ import google.generativeai as genai
 import os
 import requests
 from dotenv import load_dotenv
+from agent_history import ConversationHistory, gemini_summarizer
+from agent_steps import run_structured_turn, structured_prompt
 
 load_dotenv()
 
@@ -14,6 +16,10 @@ genai.configure(api_key=API_KEY)
 # Initialize the Gemini Pro model
 model = genai.GenerativeModel('gemini-2.0-flash-001')
 
+# "structured" (default): one schema-constrained model turn per tool call.
+# "steps": the original protocol, one request per start/plan/action step.
+AGENT_MODE = os.getenv("AGENT_MODE", "structured")
+
 def get_weather(location):
     url = f"https://wttr.in/{location}?format=%C+%t"
     response = requests.get(url)
@@ -32,6 +38,12 @@ available_tools = {
     }
 }
 
+instructions = """
+You are an AI assistant who is expert in breaking down complex problems and then resolve the user query.
+Carefully analyse the user query, pick the relevant tool from the available tools,
+and base the final result on the tool output.
+"""
+
 # Create a prompt with the system instructions and user query
 system_prompt = f"""
 You are an AI assistant who is expert in breaking down complex problems and then resolve the user query.
@@ -65,56 +77,85 @@ Output: {{ step: "observe", output: "25°C." }}
 Output: {{ step: "result", content: "The weather in New York today is 25°C." }}
 """
 
-messages = [{"role": "user", "parts": [{"text": system_prompt}]}]
-
-while True:
-    query = input("> ")
-
-    messages.append({"role": "user", "parts": [{"text": f"Input: {query}\nOutput:"}]})
-
-    # messages.append({"role": "model", "parts": [{
-    #   "text": "{\n    \"step\": \"start\",\n    \"content\": \"The user is asking for the weather in Bengaluru.\"\n}"
-    # }]})
-    # messages.append({"role": "model", "parts": [{
-    #   "text": "{\n    \"step\": \"plan\",\n    \"content\": \"From the available tools, get the current weather for Bengaluru.\",\n    \"function\": null,\n    \"input\": null\n}"
-    # }]})
-    # messages.append({"role": "model", "parts": [{
-    #   "text":  "{\n    \"step\": \"action\",\n    \"content\": \"Calling the get_weather tool to get the weather for Bengaluru.\",\n    \"function\": \"get_weather\",\n    \"input\": \"Bengaluru\"\n}"
-    # }]})
-    # messages.append({"role": "model", "parts": [{
-    #   "text":  "{\n    \"step\": \"observe\",\n    \"content\": \"Observed the output from the get_weather tool.\",\n    \"function\": null,\n    \"input\": null,\n    \"output\": \"28°C, Clear Sky\"\n}"
-    # }]})
-    # messages.append({"role": "model", "parts": [{
-    #   "text": "{\n    \"step\": \"result\",\n    \"content\": \"The weather in Bengaluru is 28°C with clear sky.\"\n}"
-    # }]})
+
+def run_structured_mode():
+    """
+    One structured model turn per tool call, plus one for the result.
+    """
+    structured_model = genai.GenerativeModel(
+        'gemini-2.0-flash-001',
+        system_instruction=structured_prompt(instructions, available_tools),
+    )
+    history = ConversationHistory(summarizer=gemini_summarizer(model))
+
+    while True:
+        query = input("> ")
+        history.add_query(query)
+        print(f"👀: {run_structured_turn(structured_model, history, available_tools)}")
+
+
+def run_step_mode():
+    """
+    Original protocol: one model request per start/plan/action/observe/result step.
+    """
+    history = ConversationHistory(
+        summarizer=gemini_summarizer(model),
+        pinned=[{"role": "user", "parts": [{"text": system_prompt}]}],
+    )
 
     while True:
-        response = model.generate_content(
-            contents=messages,
-            generation_config={
-                "response_mime_type": "application/json",
-                # Consider defining response_schema for stricter JSON output
-            }
-        )
-
-        parsed_response = json.loads(response.candidates[0].content.parts[0].text)
-        messages.append({"role": "model", "parts": [{"text": json.dumps(parsed_response)}]})
-
-        if parsed_response.get("step") == "start" or parsed_response.get("step") == "plan":
-            print(f"🧠: {parsed_response.get('content')}")
-            continue
-
-        if parsed_response.get("step") == "action":
-            tool_name = parsed_response.get("function")
-            tool_input_param = parsed_response.get("input")
-
-            if tool_name in available_tools:
-                output = available_tools[tool_name]['fn'](tool_input_param)
-                # messages.append({"role": "model", "parts": [{"text": f"{{\"step\": \"observe\", \"output\": \"{result}\"}}" }]})
-                messages.append({"role": "model", "parts": [{"text": json.dumps({ "steps": "observe", "output": output}) }]})
+        query = input("> ")
+
+        history.add_query(f"Input: {query}\nOutput:")
+
+        # messages.append({"role": "model", "parts": [{
+        #   "text": "{\n    \"step\": \"start\",\n    \"content\": \"The user is asking for the weather in Bengaluru.\"\n}"
+        # }]})
+        # messages.append({"role": "model", "parts": [{
+        #   "text": "{\n    \"step\": \"plan\",\n    \"content\": \"From the available tools, get the current weather for Bengaluru.\",\n    \"function\": null,\n    \"input\": null\n}"
+        # }]})
+        # messages.append({"role": "model", "parts": [{
+        #   "text":  "{\n    \"step\": \"action\",\n    \"content\": \"Calling the get_weather tool to get the weather for Bengaluru.\",\n    \"function\": \"get_weather\",\n    \"input\": \"Bengaluru\"\n}"
+        # }]})
+        # messages.append({"role": "model", "parts": [{
+        #   "text":  "{\n    \"step\": \"observe\",\n    \"content\": \"Observed the output from the get_weather tool.\",\n    \"function\": null,\n    \"input\": null,\n    \"output\": \"28°C, Clear Sky\"\n}"
+        # }]})
+        # messages.append({"role": "model", "parts": [{
+        #   "text": "{\n    \"step\": \"result\",\n    \"content\": \"The weather in Bengaluru is 28°C with clear sky.\"\n}"
+        # }]})
+
+        while True:
+            response = model.generate_content(
+                contents=history.contents(),
+                generation_config={
+                    "response_mime_type": "application/json",
+                    # Consider defining response_schema for stricter JSON output
+                }
+            )
+
+            parsed_response = json.loads(response.candidates[0].content.parts[0].text)
+            history.add("model", json.dumps(parsed_response))
+
+            if parsed_response.get("step") == "start" or parsed_response.get("step") == "plan":
+                print(f"🧠: {parsed_response.get('content')}")
                 continue
 
-        if parsed_response.get("step") == "result":
-            print(f"👀: {parsed_response.get('content')}")
-            break
+            if parsed_response.get("step") == "action":
+                tool_name = parsed_response.get("function")
+                tool_input_param = parsed_response.get("input")
+
+                if tool_name in available_tools:
+                    output = available_tools[tool_name]['fn'](tool_input_param)
+                    # messages.append({"role": "model", "parts": [{"text": f"{{\"step\": \"observe\", \"output\": \"{result}\"}}" }]})
+                    history.add_observation(output, role="model")
+                    continue
+
+            if parsed_response.get("step") == "result":
+                print(f"👀: {parsed_response.get('content')}")
+                break
+
 
+if AGENT_MODE == "steps":
+    run_step_mode()
+else:
+    run_structured_mode()